@@ -0,0 +1,75 @@
+# FILE: coalesce.py
+# Single-flight request coalescing.
+#
+# The API endpoints are plain (sync) functions that FastAPI runs in its
+# threadpool, so when many clients ask for the same expensive payload at once
+# (a deploy going live, a cache expiring) each would start its own rebuild in a
+# separate worker. SingleFlight lets the first caller for a key do the work
+# while concurrent callers for the same key wait for, and share, its result.
+
+import threading
+from collections import defaultdict
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key. Only calls that overlap in time are
+    merged; nothing is cached once the in-flight call has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = defaultdict(lambda: {'requests': 0, 'executions': 0, 'coalesced': 0})
+
+    def do(self, key, fn, family=None):
+        """
+        Runs fn() for `key` unless a call for the same key is already in
+        flight, in which case it waits for that call and returns its result
+        (or re-raises its exception). `family` groups keys in the counters,
+        e.g. every table payload under 'table'.
+        """
+        family = family or str(key)
+        with self._lock:
+            counters = self._counters[family]
+            counters['requests'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                counters['executions'] += 1
+            else:
+                counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Counters per family, plus the number of calls currently in flight."""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'families': {family: dict(c) for family, c in self._counters.items()},
+            }
@@ -0,0 +1,132 @@
+# FILE: events.py
+# Change notifications for open dashboards (GET /api/events, Server-Sent Events).
+#
+# The snapshot watcher (snapshot.py) is the single producer: after each
+# rebuild, describe_change() compares the old and new snapshot and the
+# resulting event is published to the EventHub, which fans it out to one small
+# asyncio.Queue per connected client. An idle client is just a parked
+# coroutine waiting on its queue, so open tabs cost no polling and no DB work;
+# they refetch only the tables/graph named in an event.
+
+import asyncio
+import json
+
+DEFAULT_KEEPALIVE_S = 15.0
+# Events a slow client may fall behind by before it is told to resync.
+SUBSCRIBER_QUEUE_SIZE = 16
+# Above this many affected node ids the event says "many" (nodes = null).
+MAX_EVENT_NODE_IDS = 200
+
+
+# ===================================================================
+# SNAPSHOT DIFF
+# ===================================================================
+def _edge_key(edge):
+    return (edge['from'], edge['to'], edge['type'], edge.get('weight'), edge.get('is_direct'))
+
+def describe_change(old, new):
+    """
+    Compares two snapshots. Returns the change event payload, or None if
+    nothing visible changed:
+      data_version  the new snapshot's version
+      tables        names of tables whose rows changed (or that appeared/disappeared)
+      table_list    whether the list of tables itself changed
+      graph         whether /api/graph-data changed
+      nodes         ids of nodes that changed or gained/lost edges (null if many)
+    """
+    tables = sorted(
+        name for name in set(old.table_payloads) | set(new.table_payloads)
+        if old.table_payloads.get(name) != new.table_payloads.get(name)
+    )
+    table_list = old.tables != new.tables
+
+    old_nodes = {n['id']: n for n in old.graph['nodes']}
+    new_nodes = {n['id']: n for n in new.graph['nodes']}
+    affected = {i for i in old_nodes.keys() | new_nodes.keys() if old_nodes.get(i) != new_nodes.get(i)}
+    old_edges = {_edge_key(e) for e in old.graph['edges']}
+    new_edges = {_edge_key(e) for e in new.graph['edges']}
+    for edge in old_edges ^ new_edges:
+        affected.update(edge[:2])
+
+    graph = bool(affected)
+    if not (tables or table_list or graph):
+        return None
+    return {
+        'data_version': new.version,
+        'tables': tables,
+        'table_list': table_list,
+        'graph': graph,
+        'nodes': sorted(affected, key=str) if len(affected) <= MAX_EVENT_NODE_IDS else None,
+    }
+
+
+# ===================================================================
+# FAN-OUT
+# ===================================================================
+class EventHub:
+    """Fans events out to subscriber queues. Use from the event loop only."""
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self.published = 0
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event):
+        self.published += 1
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(('change', event))
+            except asyncio.QueueFull:
+                # The client is far behind: drop its backlog and have it refetch everything.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('resync', {'data_version': event['data_version']}))
+
+    def close(self):
+        """Ends every open stream (on shutdown)."""
+        for queue in self._subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def stats(self):
+        return {'subscribers': len(self._subscribers), 'published': self.published}
+
+
+def format_sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+async def stream_events(hub, data_version, keepalive=DEFAULT_KEEPALIVE_S):
+    """
+    SSE body for one client: first a 'version' event with the current data
+    version (so a reconnecting client can tell whether it missed changes),
+    then every published event, with a comment line as keepalive.
+    """
+    queue = hub.subscribe()
+    try:
+        yield format_sse('version', {'data_version': data_version}, data_version)
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                return
+            event, data = item
+            yield format_sse(event, data, data['data_version'])
+    finally:
+        hub.unsubscribe(queue)
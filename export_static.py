@@ -0,0 +1,208 @@
+# FILE: export_static.py
+# Writes a static, backend-free bundle of the knowledge base that index.html /
+# script.js can read without main.py running.
+#
+# Bundle layout (relative to --out):
+#   manifest.json                        entry point, the only file that is rewritten in place
+#   tables/<table>.<hash>.json           one shard per table, same rows as /api/table/{name}
+#   graph/graph.<hash>.json              same payload as /api/graph-data
+#   nodes/<bucket>.<hash>.json           {node_id: {node, neighbours, edges}}, bucketed by node_bucket()
+#   prefix/<group>.<hash>.json           {entries: sorted [key, id, label], by_label: [id, label]} for the selectors
+#
+# Every shard is content-addressed, so it can be served with an immutable,
+# far-future cache header; only manifest.json needs a short cache lifetime.
+# Re-running the export only writes shards whose content changed.
+#
+# Usage:
+#   python export_static.py --out static_bundle [--database-url sqlite:///./mining_knowledge.db] [--prune]
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import date, datetime, timezone
+from enum import Enum
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from migrate import migrate
+from prefix_index import build_prefix_partitions, label_order
+from queries import build_graph_data, build_table_data, list_table_names, model_for_table
+from settings import database_url
+
+DEFAULT_OUT_DIR = "static_bundle"
+DEFAULT_NODE_BUCKETS = 64
+MANIFEST_NAME = "manifest.json"
+BUNDLE_FORMAT = 2
+
+
+# ===================================================================
+# ENCODING & SHARD WRITING
+# ===================================================================
+def _json_default(value):
+    # Mirror what FastAPI's encoder produces for the API responses.
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def encode(payload):
+    """Canonical JSON bytes: stable key order, so equal content gives equal hashes."""
+    return json.dumps(payload, default=_json_default, ensure_ascii=False,
+                      sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def node_bucket(node_id, buckets):
+    """
+    32-bit FNV-1a over the UTF-8 bytes of the id, modulo the bucket count.
+    Clients compute the same hash to find the shard holding a node.
+    """
+    h = 0x811c9dc5
+    for byte in str(node_id).encode('utf-8'):
+        h ^= byte
+        h = (h * 0x01000193) & 0xffffffff
+    return h % buckets
+
+def _safe_name(name):
+    return ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in str(name))
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def write_shard(out_dir, kind, name, payload, stats):
+    """Writes a content-addressed shard unless an identical one exists. Returns its relative path."""
+    data = encode(payload)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    rel_path = f"{kind}/{_safe_name(name)}.{digest}.json"
+    path = os.path.join(out_dir, rel_path)
+    if os.path.exists(path):
+        stats['unchanged'] += 1
+    else:
+        _atomic_write(path, data)
+        stats['written'] += 1
+    return rel_path
+
+
+# ===================================================================
+# BUNDLE CONTENT
+# ===================================================================
+def build_neighbourhoods(graph):
+    """Maps every node id to the node itself, its neighbour ids and its incident edges."""
+    hoods = {n['id']: {'node': n, 'neighbours': [], 'edges': []} for n in graph['nodes']}
+    for edge in graph['edges']:
+        for this_end, other_end in ((edge['from'], edge['to']), (edge['to'], edge['from'])):
+            hood = hoods.get(this_end)
+            if hood is None:
+                continue
+            hood['edges'].append(edge)
+            if other_end not in hood['neighbours']:
+                hood['neighbours'].append(other_end)
+    return hoods
+
+def export_bundle(db, table_names, out_dir, node_buckets=DEFAULT_NODE_BUCKETS, prune=False):
+    """
+    Exports the database behind `db` into `out_dir`. Returns a summary dict with
+    the number of shards written / left unchanged and whether the manifest changed.
+    """
+    stats = {'written': 0, 'unchanged': 0, 'pruned': 0, 'manifest_changed': False}
+
+    tables = {}
+    for table_name in table_names:
+        ModelClass = model_for_table(table_name)
+        if ModelClass is None:
+            continue
+        tables[table_name] = write_shard(out_dir, 'tables', table_name, build_table_data(db, ModelClass), stats)
+
+    graph = build_graph_data(db)
+    graph_path = write_shard(out_dir, 'graph', 'graph', graph, stats)
+
+    buckets = [{} for _ in range(node_buckets)]
+    for node_id, hood in build_neighbourhoods(graph).items():
+        buckets[node_bucket(node_id, node_buckets)][node_id] = hood
+    node_shards = [write_shard(out_dir, 'nodes', f"{i:03d}", bucket, stats) for i, bucket in enumerate(buckets)]
+
+    prefix = {group: write_shard(out_dir, 'prefix', group, {'entries': entries, 'by_label': label_order(entries)}, stats)
+              for group, entries in build_prefix_partitions(graph['nodes']).items()}
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'tables': tables,
+        'graph': graph_path,
+        'nodes': {'hash': 'fnv1a32', 'buckets': node_buckets, 'shards': node_shards},
+        'prefix': prefix,
+    }
+    # The data version only depends on the shard names, which are content hashes.
+    manifest['data_version'] = hashlib.sha256(encode(manifest)).hexdigest()[:16]
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'rb') as f:
+            previous = json.loads(f.read())
+    if previous is None or previous.get('data_version') != manifest['data_version']:
+        manifest['generated_at'] = datetime.now(timezone.utc).isoformat()
+        _atomic_write(manifest_path, encode(manifest))
+        stats['manifest_changed'] = True
+    else:
+        manifest = previous
+
+    if prune:
+        stats['pruned'] = prune_unreferenced(out_dir, manifest)
+    return stats
+
+def _referenced_paths(manifest):
+    paths = set(manifest['tables'].values())
+    paths.add(manifest['graph'])
+    paths.update(manifest['nodes']['shards'])
+    paths.update(manifest['prefix'].values())
+    return paths
+
+def prune_unreferenced(out_dir, manifest):
+    """Deletes shards that the current manifest no longer references."""
+    keep = _referenced_paths(manifest)
+    removed = 0
+    for kind in ('tables', 'graph', 'nodes', 'prefix'):
+        kind_dir = os.path.join(out_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for file_name in os.listdir(kind_dir):
+            if f"{kind}/{file_name}" not in keep:
+                os.remove(os.path.join(kind_dir, file_name))
+                removed += 1
+    return removed
+
+
+# ===================================================================
+# CLI
+# ===================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Export the knowledge base as a static, sharded JSON bundle.")
+    parser.add_argument("--database-url", default=database_url())
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="Output directory (default: %(default)s)")
+    parser.add_argument("--buckets", type=int, default=DEFAULT_NODE_BUCKETS, help="Number of node neighbourhood shards")
+    parser.add_argument("--prune", action="store_true", help="Delete shards no longer referenced by the manifest")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    migrate(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    try:
+        stats = export_bundle(db, list_table_names(engine), args.out,
+                              node_buckets=args.buckets, prune=args.prune)
+    finally:
+        db.close()
+        engine.dispose()
+
+    print(f"✅ Static bundle exported to '{args.out}': {stats['written']} shards written, "
+          f"{stats['unchanged']} unchanged, {stats['pruned']} pruned, "
+          f"manifest {'updated' if stats['manifest_changed'] else 'unchanged'}.")
+
+
+if __name__ == "__main__":
+    main()
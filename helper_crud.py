@@ -3,6 +3,7 @@
 from sqlalchemy.orm import Session
 import models
 import valid_schemas
+import history
 
 # ===================================================================
 # GENERIC HELPER (for simple, single-key nodes)
@@ -62,6 +63,7 @@ def create_concern(db: Session, concern: valid_schemas.ConcernCreate):
 
 # ===================================================================
 # LINK HELPERS (Rewritten to be specific and avoid the TypeError)
+# New links also open their first version in the link history (history.py).
 # ===================================================================
 def create_practice_to_target_link(db: Session, link: valid_schemas.PracticeToTargetLinkCreate):
     # Check if the link already exists using the composite primary key
@@ -74,6 +76,7 @@ def create_practice_to_target_link(db: Session, link: valid_schemas.PracticeToTa
         # If it doesn't exist, create it using all the data from the Pydantic model
         db_obj = models.PracticeToTargetLink(**link.model_dump())
         db.add(db_obj)
+        history.record_insert(db, db_obj)
     return db_obj
 
 def create_practice_to_action_link(db: Session, link: valid_schemas.PracticeToActionLinkCreate):
@@ -85,6 +88,7 @@ def create_practice_to_action_link(db: Session, link: valid_schemas.PracticeToAc
     if not db_obj:
         db_obj = models.PracticeToActionLink(**link.model_dump())
         db.add(db_obj)
+        history.record_insert(db, db_obj)
     return db_obj
 
 def create_stakeholder_to_concern_link(db: Session, link: valid_schemas.StakeholderToConcernLinkCreate):
@@ -96,6 +100,7 @@ def create_stakeholder_to_concern_link(db: Session, link: valid_schemas.Stakehol
     if not db_obj:
         db_obj = models.StakeholderToConcernLink(**link.model_dump())
         db.add(db_obj)
+        history.record_insert(db, db_obj)
     return db_obj
 
 def create_concern_to_target_link(db: Session, link: valid_schemas.ConcernToTargetLinkCreate):
@@ -107,6 +112,7 @@ def create_concern_to_target_link(db: Session, link: valid_schemas.ConcernToTarg
     if not db_obj:
         db_obj = models.ConcernToTargetLink(**link.model_dump())
         db.add(db_obj)
+        history.record_insert(db, db_obj)
     return db_obj
 
 def create_sd_objective_to_sdg_link(db: Session, link: valid_schemas.SDObjectiveToSDGLinkCreate):
@@ -118,6 +124,7 @@ def create_sd_objective_to_sdg_link(db: Session, link: valid_schemas.SDObjective
     if not db_obj:
         db_obj = models.SDObjectiveToSDGLink(**link.model_dump())
         db.add(db_obj)
+        history.record_insert(db, db_obj)
     return db_obj
 
 
@@ -142,6 +149,7 @@ def create_mining_indicator_to_target_link(db: Session, link: valid_schemas.Mini
     if not db_obj:
         db_obj = models.MiningIndicatorToTargetLink(**link.model_dump())
         db.add(db_obj)
+        history.record_insert(db, db_obj)
     return db_obj
 
 def create_practice_to_mining_indicator_link(db: Session, link: valid_schemas.PracticeToMiningIndicatorLinkCreate):
@@ -153,6 +161,7 @@ def create_practice_to_mining_indicator_link(db: Session, link: valid_schemas.Pr
     if not db_obj:
         db_obj = models.PracticeToMiningIndicatorLink(**link.model_dump())
         db.add(db_obj)
+        history.record_insert(db, db_obj)
     return db_obj
 
 
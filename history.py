@@ -0,0 +1,117 @@
+# FILE: history.py
+# Writing and reading the append-only link history (see the LINK HISTORY
+# section of models.py).
+#
+# Every write to a link table records its effect on the history in the same
+# transaction: a changed or deleted link closes its open version
+# (valid_to = now), an inserted or changed link opens a new version copied from
+# the link row. Reading the graph "as of" a time is then one range query per
+# history table: valid_from <= t < valid_to (or valid_to IS NULL).
+#
+# Times are stored as naive UTC, like PracticeToTargetLink.last_updated.
+
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, and_, exists, func, literal, or_, select, tuple_
+
+from models import LINK_HISTORY
+
+# Keys per statement for the bulk (a, b) IN (...) conditions.
+KEY_CHUNK_SIZE = 500
+
+
+def utc_naive(value=None):
+    """Returns `value` (default: now) as a naive UTC datetime. Naive input is taken to be UTC."""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def is_link_model(model):
+    return model in LINK_HISTORY
+
+def _key_columns(table):
+    return [c.name for c in table.primary_key.columns]
+
+def _stored_columns(table):
+    # Generated columns (the *_rank levels) are computed, never inserted
+    return [c.name for c in table.columns if c.computed is None]
+
+def _chunks(keys):
+    keys = list(keys)
+    for i in range(0, len(keys), KEY_CHUNK_SIZE):
+        yield keys[i:i + KEY_CHUNK_SIZE]
+
+
+# ===================================================================
+# WRITING
+# ===================================================================
+def close_versions(db, model, keys, at):
+    """Ends the open version of each link in `keys` (primary-key tuples) at `at`."""
+    history = LINK_HISTORY[model].__table__
+    key_cols = [history.c[k] for k in _key_columns(model.__table__)]
+    for chunk in _chunks(keys):
+        db.execute(
+            history.update()
+            .where(tuple_(*key_cols).in_(chunk), history.c.valid_to.is_(None))
+            .values(valid_to=at)
+        )
+
+def open_versions(db, model, keys, at):
+    """Opens a version at `at` for each link in `keys`, copied from its current row."""
+    table = model.__table__
+    history = LINK_HISTORY[model].__table__
+    columns = _stored_columns(table)
+    key_cols = [table.c[k] for k in _key_columns(table)]
+    for chunk in _chunks(keys):
+        source = select(*[table.c[c] for c in columns], literal(at, DateTime())).where(tuple_(*key_cols).in_(chunk))
+        db.execute(history.insert().from_select(columns + ['valid_from'], source))
+
+def record_changes(db, model, inserted=(), updated=(), deleted=(), at=None):
+    """
+    Records the effect of link-table writes (already executed, same transaction)
+    on the history. Arguments are primary-key tuples.
+    """
+    at = utc_naive(at)
+    close_versions(db, model, list(updated) + list(deleted), at)
+    open_versions(db, model, list(inserted) + list(updated), at)
+
+def record_insert(db, obj, at=None):
+    """record_changes for one newly added ORM link object (flushes it first)."""
+    db.flush([obj])
+    model = type(obj)
+    key = tuple(getattr(obj, k) for k in _key_columns(model.__table__))
+    record_changes(db, model, inserted=[key], at=at)
+
+def backfill(db, model, at=None):
+    """
+    Opens a version for every link that has none, e.g. rows written before the
+    history existed or by a bulk load. Uses last_updated as valid_from where
+    the link has it. Returns the number of versions opened.
+    """
+    at = utc_naive(at)
+    table = model.__table__
+    history = LINK_HISTORY[model].__table__
+    columns = _stored_columns(table)
+    valid_from = literal(at, DateTime())
+    if 'last_updated' in table.c:
+        valid_from = func.coalesce(table.c.last_updated, valid_from)
+    has_open_version = exists().where(
+        *[history.c[k] == table.c[k] for k in _key_columns(table)],
+        history.c.valid_to.is_(None),
+    )
+    source = select(*[table.c[c] for c in columns], valid_from).where(~has_open_version)
+    return db.execute(history.insert().from_select(columns + ['valid_from'], source)).rowcount
+
+
+# ===================================================================
+# READING
+# ===================================================================
+def valid_at(history_model, as_of):
+    """SQL condition selecting the versions that were current at `as_of`."""
+    as_of = utc_naive(as_of)
+    return and_(
+        history_model.valid_from <= as_of,
+        or_(history_model.valid_to.is_(None), history_model.valid_to > as_of),
+    )
@@ -0,0 +1,490 @@
+# FILE: ingest.py
+# Streaming ingestion of the raw CSV/XLSX data into the knowledge base.
+#
+# Replaces the pandas-based seeding cells of 01_create_and_seed.ipynb:
+#   - rows are streamed from the source files (csv module / openpyxl read-only),
+#   - validated in batches with a TypeAdapter(list[<valid_schemas.*Create>]),
+#   - source files are parsed in parallel in a process pool and streamed back
+#     batch by batch through bounded queues,
+#   - and loaded in foreign-key dependency order with bulk INSERTs.
+# Like helper_crud.get_or_create, loading never overwrites rows that already exist.
+# The sync command instead makes each table match its source file, writing only
+# the rows that were added, changed or removed. Both keep the link history
+# (history.py) up to date.
+#
+# Usage:
+#   python ingest.py load [--data-dir data_raw_in_csv] [--workers 4] [--batch-size 1000]
+#   python ingest.py sync [--data-dir data_raw_in_csv] [--dry-run] [--json]
+#   python ingest.py analysis [--xlsx data_raw_in_csv/raw_ana_sdg_practice_link.xlsx] > analysis.csv
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from enum import Enum
+from itertools import islice
+from multiprocessing import Manager
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import and_, bindparam, create_engine, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+
+import history
+import models
+import valid_schemas
+from migrate import migrate
+from settings import database_url
+
+DEFAULT_DATA_DIR = "data_raw_in_csv"
+DEFAULT_BATCH_SIZE = 1000
+# Validated batches a parser may get ahead of the loader, per source file.
+PARSE_QUEUE_BATCHES = 4
+ANALYSIS_XLSX = os.path.join(DEFAULT_DATA_DIR, "raw_ana_sdg_practice_link.xlsx")
+
+# ===================================================================
+# SOURCE MAP
+# source file (relative to the data dir) -> (model, Create schema)
+# Same pairs as the seeding maps in 01_create_and_seed.ipynb.
+# ===================================================================
+SOURCES = {
+    # --- Nodes ---
+    "entities_nodes/sd_obj.csv": (models.SD_Objective, valid_schemas.SD_ObjectiveCreate),
+    "entities_nodes/sdg_goal.csv": (models.SDG_Goal, valid_schemas.SDG_GoalCreate),
+    "entities_nodes/sdg_target.csv": (models.SDG_Target, valid_schemas.SDG_TargetCreate),
+    "entities_nodes/sdg_indicator.csv": (models.SDG_Indicator, valid_schemas.SDG_IndicatorCreate),
+    "entities_nodes/practice_action.csv": (models.PracticeAction, valid_schemas.PracticeActionCreate),
+    "entities_nodes/practice.csv": (models.Practice, valid_schemas.PracticeCreate),
+    "entities_nodes/sh_group.csv": (models.Stakeholder_Group, valid_schemas.Stakeholder_GroupCreate),
+    "entities_nodes/sh.csv": (models.Stakeholder, valid_schemas.StakeholderCreate),
+    "entities_nodes/sh_concern.csv": (models.Concern, valid_schemas.ConcernCreate),
+    "entities_nodes/mining_indicator.csv": (models.MiningIndicator, valid_schemas.MiningIndicatorCreate),
+    # --- Links (Edges) ---
+    "links_edges/practice_to_action.csv": (models.PracticeToActionLink, valid_schemas.PracticeToActionLinkCreate),
+    "links_edges/sh_to_concern.csv": (models.StakeholderToConcernLink, valid_schemas.StakeholderToConcernLinkCreate),
+    "links_edges/concern_to_target.csv": (models.ConcernToTargetLink, valid_schemas.ConcernToTargetLinkCreate),
+    "links_edges/m_indicator_to_target.csv": (models.MiningIndicatorToTargetLink, valid_schemas.MiningIndicatorToTargetLinkCreate),
+    "links_edges/practice_to_m_indicator.csv": (models.PracticeToMiningIndicatorLink, valid_schemas.PracticeToMiningIndicatorLinkCreate),
+    "links_edges/practice_to_target.csv": (models.PracticeToTargetLink, valid_schemas.PracticeToTargetLinkCreate),
+    "links_edges/sd_obj_to_sdg.csv": (models.SDObjectiveToSDGLink, valid_schemas.SDObjectiveToSDGLinkCreate),
+}
+
+# Files whose empty cells mean "no value" (None) rather than an empty string.
+# practice.csv has optional LevelEnum/bool columns that cannot be ''.
+BLANK_AS_NONE = {"entities_nodes/practice.csv"}
+
+# One adapter per schema, built lazily (and once per worker process).
+_adapters = {}
+
+def _adapter_for(schema):
+    if schema not in _adapters:
+        _adapters[schema] = TypeAdapter(list[schema])
+    return _adapters[schema]
+
+
+# ===================================================================
+# ROW STREAMING
+# ===================================================================
+def iter_csv_rows(path, blank_as_none=False):
+    """Yields each CSV row as a dict of strings, like pandas with dtype=str and keep_default_na=False."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f, restval=''):
+            if blank_as_none:
+                row = {k: (None if v == '' else v) for k, v in row.items()}
+            yield row
+
+def iter_xlsx_rows(path, sheet=None, header_row=1, blank_as_none=False):
+    """Yields rows of a worksheet as dicts keyed by the header row, reading the workbook in read-only mode."""
+    from openpyxl import load_workbook  # only needed for workbook sources
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        rows = ws.iter_rows(min_row=header_row, values_only=True)
+        header = [str(h).strip() if h is not None else f"column_{i}" for i, h in enumerate(next(rows, ()))]
+        for values in rows:
+            if all(v is None for v in values):
+                continue
+            row = {}
+            for key, value in zip(header, values):
+                if value is None:
+                    value = None if blank_as_none else ''
+                row[key] = value if value is None else str(value)
+            yield row
+    finally:
+        wb.close()
+
+def iter_source_rows(path, blank_as_none=False):
+    if path.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(path, blank_as_none=blank_as_none)
+    return iter_csv_rows(path, blank_as_none=blank_as_none)
+
+def iter_batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ===================================================================
+# PARSING & VALIDATION
+# ===================================================================
+def validate_batch(schema, batch, source, first_row_number):
+    """
+    Validates a whole batch in one TypeAdapter call and returns plain dicts
+    ready for insertion. Errors are reported with the source file and CSV line.
+    """
+    adapter = _adapter_for(schema)
+    try:
+        return adapter.dump_python(adapter.validate_python(batch))
+    except ValidationError as e:
+        first = e.errors()[0]
+        index, *field = first['loc']
+        raise ValueError(f"{source}, row {first_row_number + index}: {'.'.join(map(str, field))}: "
+                         f"{first['msg']} ({e.error_count()} errors in batch)") from None
+
+def _put(out, item, abort):
+    """Puts on a bounded queue, waiting while it is full. Returns False if the load was aborted."""
+    while not abort.is_set():
+        try:
+            out.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def parse_source(data_dir, source, out, abort, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Streams and validates one source file in a worker process, putting each
+    validated batch on the `out` queue as soon as it is ready, then None.
+    A parse error is put on the queue instead. Stops early once `abort` is set.
+    """
+    _, schema = SOURCES[source]
+    try:
+        rows = iter_source_rows(os.path.join(data_dir, source), blank_as_none=source in BLANK_AS_NONE)
+        row_number = 2  # line 1 is the header
+        for batch in iter_batches(rows, batch_size):
+            # Waits while the loader is PARSE_QUEUE_BATCHES behind, bounding memory
+            if not _put(out, validate_batch(schema, batch, source, row_number), abort):
+                return
+            row_number += len(batch)
+    except Exception as e:
+        _put(out, ValueError(str(e)), abort)
+        return
+    _put(out, None, abort)
+
+@contextmanager
+def parallel_parse(data_dir, ordered, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Parses the `ordered` sources in a process pool and yields a function
+    batches(source) that streams one source's validated batches. Sources must
+    be consumed in order; each one's batches are dropped once consumed, so
+    memory holds at most PARSE_QUEUE_BATCHES batches per file, not the dataset.
+    """
+    # The pool is shut down (waiting for its workers) before the manager.
+    with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+        # All files are submitted up front (the pool starts them in this order);
+        # parsing of later files overlaps with loading of earlier ones.
+        abort = manager.Event()
+        queues, futures = {}, {}
+        for source in ordered:
+            queues[source] = manager.Queue(maxsize=PARSE_QUEUE_BATCHES)
+            futures[source] = pool.submit(parse_source, data_dir, source, queues[source], abort, batch_size)
+
+        def batches(source):
+            out, future = queues.pop(source), futures.pop(source)
+            while True:
+                try:
+                    item = out.get(timeout=1)
+                except queue.Empty:
+                    if future.done():
+                        future.result()  # re-raises a crashed worker's error
+                        raise RuntimeError(f"{source}: parser exited without finishing")
+                    continue
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        try:
+            yield batches
+        finally:
+            # Sources left unconsumed (after an error): stop their parsers.
+            if futures:
+                abort.set()
+                for future in futures.values():
+                    future.cancel()
+
+
+# ===================================================================
+# LOADING
+# ===================================================================
+def load_order(sources):
+    """Sorts sources so that every table is loaded after the tables it references."""
+    table_rank = {table.name: i for i, table in enumerate(models.Base.metadata.sorted_tables)}
+    return sorted(sources, key=lambda s: table_rank[SOURCES[s][0].__table__.name])
+
+def insert_ignoring_existing(db, model, rows):
+    """Bulk-inserts rows, skipping primary keys that already exist. Returns the number inserted."""
+    if not rows:
+        return 0
+    stmt = sqlite.insert(model.__table__).on_conflict_do_nothing()
+    return db.execute(stmt, rows).rowcount
+
+def ingest(db, data_dir=DEFAULT_DATA_DIR, sources=None, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Parses `sources` (default: all) in parallel and loads them into `db` in one
+    transaction. Returns {source: (rows_read, rows_inserted)}.
+    """
+    ordered = load_order(sources or SOURCES)
+    summary = {}
+    with parallel_parse(data_dir, ordered, workers, batch_size) as batches:
+        try:
+            for source in ordered:
+                model, _ = SOURCES[source]
+                read = inserted = 0
+                for batch in batches(source):
+                    read += len(batch)
+                    inserted += insert_ignoring_existing(db, model, batch)
+                if history.is_link_model(model):
+                    history.backfill(db, model)
+                summary[source] = (read, inserted)
+                print(f"{source}: {read} rows read, {inserted} inserted.")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return summary
+
+
+# ===================================================================
+# INCREMENTAL SYNC
+# Instead of inserting what is missing, make each table match its source
+# file: rows are compared by primary key and a content hash over the
+# schema's fields, and only the differences are written.
+# ===================================================================
+def _hash_default(value):
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+def row_hash(row, fields):
+    """Stable content hash of a row (a mapping) over the given fields, in order."""
+    payload = [row.get(field) for field in fields]
+    return hashlib.sha1(json.dumps(payload, default=_hash_default, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def diff_table(db, model, schema, source_rows):
+    """
+    Compares validated source rows with the table contents in two bulk passes
+    (one SELECT, one dict comparison). Returns (inserts, updates, delete_keys).
+    """
+    table = model.__table__
+    fields = list(schema.model_fields)
+    key_cols = [c.name for c in table.primary_key.columns]
+
+    source = {}
+    for row in source_rows:
+        source[tuple(row[k] for k in key_cols)] = row
+    current = {
+        tuple(r[k] for k in key_cols): row_hash(r, fields)
+        for r in db.execute(select(*[table.c[f] for f in fields])).mappings()
+    }
+
+    inserts, updates = [], []
+    for key, row in source.items():
+        if key not in current:
+            inserts.append(row)
+        elif current[key] != row_hash(row, fields):
+            updates.append(row)
+    delete_keys = [key for key in current if key not in source]
+    return inserts, updates, delete_keys
+
+def apply_diff(db, model, inserts, updates, delete_keys):
+    """
+    Applies one table's changes in a single transaction. For link tables the
+    changes are also recorded in the link history.
+    """
+    table = model.__table__
+    key_cols = [c.name for c in table.primary_key.columns]
+    key_match = and_(*[table.c[k] == bindparam(f"key_{k}") for k in key_cols])
+    now = datetime.now(timezone.utc)
+    try:
+        if inserts:
+            db.execute(table.insert(), inserts)
+        if updates:
+            values = {f: bindparam(f) for f in updates[0] if f not in key_cols}
+            if 'last_updated' in table.c:
+                values['last_updated'] = now
+            params = [{**row, **{f"key_{k}": row[k] for k in key_cols}} for row in updates]
+            db.execute(table.update().where(key_match).values(values), params)
+        if delete_keys:
+            db.execute(table.delete().where(key_match),
+                       [{f"key_{k}": v for k, v in zip(key_cols, key)} for key in delete_keys])
+        if history.is_link_model(model):
+            history.record_changes(db, model,
+                                   inserted=[tuple(row[k] for k in key_cols) for row in inserts],
+                                   updated=[tuple(row[k] for k in key_cols) for row in updates],
+                                   deleted=delete_keys, at=now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def sync(db, data_dir=DEFAULT_DATA_DIR, sources=None, workers=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Makes the tables behind `sources` (default: all) match their files.
+    Returns {table: {'inserted', 'updated', 'deleted', 'changed_keys'}} for
+    every table that changed, e.g. to invalidate exactly those caches.
+    """
+    ordered = load_order(sources or SOURCES)
+    report = {}
+    deletes = []
+    with parallel_parse(data_dir, ordered, workers, batch_size) as batches:
+        for source in ordered:
+            model, schema = SOURCES[source]
+            # The diff needs the whole file, but only one file at a time
+            rows = [row for batch in batches(source) for row in batch]
+            inserts, updates, delete_keys = diff_table(db, model, schema, rows)
+            if not (inserts or updates or delete_keys):
+                continue
+            if not dry_run:
+                # Parents are inserted before their children (FK order) ...
+                apply_diff(db, model, inserts, updates, [])
+                if delete_keys:
+                    deletes.append((model, delete_keys))
+            key_cols = [c.name for c in model.__table__.primary_key.columns]
+            report[model.__tablename__] = {
+                'inserted': len(inserts),
+                'updated': len(updates),
+                'deleted': len(delete_keys),
+                'changed_keys': [[row[k] for k in key_cols] for row in inserts + updates] + [list(k) for k in delete_keys],
+            }
+    # ... and deleted after them (reverse FK order), so foreign keys hold throughout
+    for model, delete_keys in reversed(deletes):
+        apply_diff(db, model, [], [], delete_keys)
+    if dry_run:
+        db.rollback()
+    return report
+
+
+# ===================================================================
+# RAW ANALYSIS WORKBOOK
+# raw_ana_sdg_practice_link.xlsx is the wide analysis sheet behind
+# practice_to_target.csv: one row per SDG indicator, and a
+# (Level of Relevance, Argument) column pair per practice.
+# ===================================================================
+_TARGET_RE = re.compile(r"^\s*(\d+\.[0-9a-z]+)\s")
+_INDICATOR_RE = re.compile(r"^\s*(\d+\.[0-9a-z]+\.\d+)\s")
+_NOT_RELEVANT = '\\'
+
+def iter_practice_analysis_rows(path=ANALYSIS_XLSX):
+    """
+    Streams the analysis sheet in read-only mode as long-format rows:
+    {practice, target_id, indicator_id, indicator_code, relevance_weight, argument}.
+    '\\' (not relevant) becomes relevance_weight=None; unassessed cells are skipped.
+    """
+    from openpyxl import load_workbook  # only needed for workbook sources
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        practice_header = next(rows, ())
+        practice_columns = [(i, ' '.join(str(name).split()))
+                            for i, name in enumerate(practice_header) if i >= 4 and name]
+        target_id = None
+        for values in rows:
+            target_cell, indicator_cell = values[1], values[2]
+            if target_cell and _TARGET_RE.match(str(target_cell)):
+                target_id = _TARGET_RE.match(str(target_cell)).group(1)
+            indicator_match = _INDICATOR_RE.match(str(indicator_cell or ''))
+            if not indicator_match or target_id is None:
+                continue
+            for i, practice in practice_columns:
+                level = values[i] if i < len(values) else None
+                if level is None or not str(level).strip():
+                    continue
+                level = str(level).strip()
+                argument = values[i + 1] if i + 1 < len(values) else None
+                yield {
+                    'practice': practice,
+                    'target_id': target_id,
+                    'indicator_id': indicator_match.group(1),
+                    'indicator_code': values[3],
+                    'relevance_weight': None if level == _NOT_RELEVANT else level,
+                    'argument': argument.strip() if isinstance(argument, str) else argument,
+                }
+    finally:
+        wb.close()
+
+
+# ===================================================================
+# CLI
+# ===================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Ingest the raw CSV/XLSX data into the knowledge base.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="Validate and load all source files (existing rows are kept)")
+    load.add_argument("--database-url", default=database_url())
+    load.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    load.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    load.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    sync_cmd = commands.add_parser("sync", help="Insert, update and delete rows so the tables match the source files")
+    sync_cmd.add_argument("--database-url", default=database_url())
+    sync_cmd.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    sync_cmd.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    sync_cmd.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    sync_cmd.add_argument("--dry-run", action="store_true", help="Report the changes without writing them")
+    sync_cmd.add_argument("--json", action="store_true", help="Print the change report as JSON")
+
+    analysis = commands.add_parser("analysis", help="Stream the analysis workbook as long-format CSV to stdout")
+    analysis.add_argument("--xlsx", default=ANALYSIS_XLSX)
+    args = parser.parse_args()
+
+    if args.command == "analysis":
+        writer = None
+        for row in iter_practice_analysis_rows(args.xlsx):
+            if writer is None:
+                writer = csv.DictWriter(sys.stdout, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+        return
+
+    engine = create_engine(args.database_url)
+    # Also adds the history tables and rank columns an older database lacks
+    migrate(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    try:
+        if args.command == "sync":
+            report = sync(db, data_dir=args.data_dir, workers=args.workers,
+                          batch_size=args.batch_size, dry_run=args.dry_run)
+            if args.json:
+                print(json.dumps(report, indent=2, default=_hash_default))
+            else:
+                for table, changes in report.items():
+                    print(f"{table}: {changes['inserted']} inserted, {changes['updated']} updated, "
+                          f"{changes['deleted']} deleted.")
+                verb = "would change" if args.dry_run else "changed"
+                print(f"\n✅ Sync completed: {len(report)} table(s) {verb}.")
+        else:
+            ingest(db, data_dir=args.data_dir, workers=args.workers, batch_size=args.batch_size)
+            print("\n✅ Ingestion completed successfully!")
+    finally:
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# FILE: integrity.py
+# Set-based referential integrity and data-quality audit.
+#
+# Every check is a single aggregate query over a whole table, derived from the
+# schema declared in models.py:
+#   - orphans:          one anti-join per ForeignKey (child LEFT JOIN parent WHERE parent IS NULL)
+#   - duplicates:       one GROUP BY ... HAVING COUNT(*) > 1 per primary key / unique column
+#   - enum violations:  one NOT IN (...) per Enum column
+# so the number of queries depends on the schema, not on the number of rows,
+# and nothing relies on SQLite's (usually disabled) FK enforcement.
+#
+# Usage:
+#   python integrity.py [--database-url sqlite:///./mining_knowledge.db] [--json]
+
+import argparse
+import json
+import sys
+
+from sqlalchemy import (
+    Enum as SQLAlchemyEnum, String, UniqueConstraint,
+    and_, create_engine, func, or_, select, type_coerce
+)
+from sqlalchemy.orm import sessionmaker
+
+from migrate import migrate
+from models import Base, HISTORY_TABLES
+from settings import database_url
+
+SAMPLE_LIMIT = 20
+
+
+def _as_text(column):
+    # Read raw stored values; Enum columns would otherwise fail on invalid entries.
+    return type_coerce(column, String)
+
+def _is_unset(column):
+    # The CSV seed path stores missing optional references as '' (e.g. a goal
+    # without objective); like the graph builder, treat that as "no reference".
+    return or_(column.is_(None), _as_text(column) == '')
+
+
+# ===================================================================
+# CHECKS
+# ===================================================================
+def find_orphans(db, table, fk):
+    child_col = fk.parent
+    parent = fk.column.table.alias('parent')
+    parent_col = parent.c[fk.column.name]
+    stmt = (
+        select(child_col, func.count().label('row_count'))
+        .select_from(table.outerjoin(parent, child_col == parent_col))
+        .where(and_(~_is_unset(child_col), parent_col.is_(None)))
+        .group_by(child_col)
+        .order_by(child_col)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return None
+    return {
+        'table': table.name,
+        'column': child_col.name,
+        'references': f"{fk.column.table.name}.{fk.column.name}",
+        'orphan_rows': sum(r.row_count for r in rows),
+        'orphan_values': [{'value': r[0], 'rows': r.row_count} for r in rows[:SAMPLE_LIMIT]],
+    }
+
+def find_duplicates(db, table, columns):
+    stmt = (
+        select(*[_as_text(c) for c in columns], func.count().label('row_count'))
+        .select_from(table)
+        .group_by(*columns)
+        .having(func.count() > 1)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return None
+    return {
+        'table': table.name,
+        'columns': [c.name for c in columns],
+        'duplicate_keys': len(rows),
+        'duplicate_rows': sum(r.row_count for r in rows),
+        'sample': [{'key': list(r[:-1]), 'rows': r.row_count} for r in rows[:SAMPLE_LIMIT]],
+    }
+
+def find_enum_violations(db, table, column):
+    raw = _as_text(column)
+    stmt = (
+        select(raw, func.count().label('row_count'))
+        .select_from(table)
+        .where(raw.isnot(None), raw.notin_(list(column.type.enums)))
+        .group_by(raw)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
+        return None
+    return {
+        'table': table.name,
+        'column': column.name,
+        'allowed': list(column.type.enums),
+        'invalid_rows': sum(r.row_count for r in rows),
+        'invalid_values': [{'value': r[0], 'rows': r.row_count} for r in rows[:SAMPLE_LIMIT]],
+    }
+
+def _unique_keys(table):
+    # Column(unique=True) is also represented as a UniqueConstraint here.
+    keys = []
+    if table.primary_key.columns:
+        keys.append(list(table.primary_key.columns))
+    for constraint in sorted(table.constraints, key=lambda c: [col.name for col in c.columns]):
+        if isinstance(constraint, UniqueConstraint):
+            keys.append(list(constraint.columns))
+    return keys
+
+
+# ===================================================================
+# AUDIT
+# ===================================================================
+def audit_integrity(db, metadata=Base.metadata):
+    """
+    Runs every check against the tables declared in `metadata` and returns a
+    structured report. Only failing checks are listed; `ok` is True when
+    there are none.
+    """
+    report = {
+        'ok': True,
+        'checked': {'relationships': 0, 'unique_keys': 0, 'enum_columns': 0},
+        'orphans': [],
+        'duplicates': [],
+        'enum_violations': [],
+    }
+    for table in metadata.sorted_tables:
+        if table.name in HISTORY_TABLES:
+            continue  # append-only versions, not part of the current data
+        for fk in sorted(table.foreign_keys, key=lambda fk: fk.parent.name):
+            report['checked']['relationships'] += 1
+            finding = find_orphans(db, table, fk)
+            if finding: report['orphans'].append(finding)
+        for columns in _unique_keys(table):
+            report['checked']['unique_keys'] += 1
+            finding = find_duplicates(db, table, columns)
+            if finding: report['duplicates'].append(finding)
+        for column in table.columns:
+            if isinstance(column.type, SQLAlchemyEnum):
+                report['checked']['enum_columns'] += 1
+                finding = find_enum_violations(db, table, column)
+                if finding: report['enum_violations'].append(finding)
+
+    report['ok'] = not (report['orphans'] or report['duplicates'] or report['enum_violations'])
+    return report
+
+
+def print_report(report):
+    checked = report['checked']
+    print(f"Checked {checked['relationships']} relationships, {checked['unique_keys']} unique keys, "
+          f"{checked['enum_columns']} enum columns.")
+    for o in report['orphans']:
+        values = ', '.join(repr(v['value']) for v in o['orphan_values'])
+        print(f"❌ Orphans: {o['table']}.{o['column']} -> {o['references']}: {o['orphan_rows']} rows ({values})")
+    for d in report['duplicates']:
+        print(f"❌ Duplicates: {d['table']}({', '.join(d['columns'])}): {d['duplicate_keys']} keys, {d['duplicate_rows']} rows")
+    for e in report['enum_violations']:
+        values = ', '.join(repr(v['value']) for v in e['invalid_values'])
+        print(f"❌ Enum violations: {e['table']}.{e['column']}: {e['invalid_rows']} rows ({values})")
+    if report['ok']:
+        print("✅ No integrity problems found.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit referential integrity and data quality of the knowledge base.")
+    parser.add_argument("--database-url", default=database_url())
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    migrate(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    try:
+        report = audit_integrity(db)
+    finally:
+        db.close()
+        engine.dispose()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(0 if report['ok'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# FILE: load_test.py
+# Concurrent load generator for the dashboard API.
+#
+# Starts the app locally with uvicorn (or targets an already running server),
+# drives /api/tables, /api/table/{name} and /api/graph-data with a weighted
+# request mix from N concurrent clients, and reports throughput, p50/p95/p99
+# latency and error rates per endpoint. Only the standard library is used on
+# the client side, so the numbers are not skewed by a heavy HTTP client.
+#
+# Usage:
+#   python load_test.py                                    # main:app, mix 'dashboard', concurrency 1 8 32
+#   python load_test.py --mix graph --concurrency 64 --duration 30
+#   python load_test.py --mix database --concurrency 8 32  # SQLite path, not the snapshot
+#   python load_test.py --app main:app --workers 1 --workers 4   # compare serving modes
+#   python load_test.py --url http://127.0.0.1:8000        # existing server
+
+import argparse
+import http.client
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+# ===================================================================
+# REQUEST MIXES
+# Relative weights of the endpoint kinds. 'table' requests pick a random
+# table name from /api/tables on each call.
+# The unfiltered payloads are served from the in-memory snapshot (see
+# snapshot.py). 'graph_min' (a random min_weight / direct_only filter) and
+# 'graph_asof' (a random time in the last AS_OF_WINDOW_S) bypass it: every
+# request opens a session and queries SQLite, and the random parameters keep
+# most of them from being coalesced into one query.
+# ===================================================================
+MIXES = {
+    # A user opening the page: table list, a few table views and the graph.
+    'dashboard': {'tables': 2, 'table': 5, 'graph': 3},
+    # Data Explorer users paging through tables.
+    'explorer': {'tables': 1, 'table': 9},
+    # Everyone (re)loading the knowledge graph, e.g. right after a deploy.
+    'graph': {'graph': 1},
+    # Filtered and historical graph views; every request reaches the database.
+    'database': {'graph_min': 1, 'graph_asof': 1},
+}
+
+MIN_WEIGHTS = (1, 2, 3, 4, 5)
+AS_OF_WINDOW_S = 30 * 24 * 3600
+
+STARTUP_TIMEOUT_S = 30
+
+
+# ===================================================================
+# SERVER MANAGEMENT
+# ===================================================================
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _wait_until_ready(host, port, proc, timeout=STARTUP_TIMEOUT_S):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/api/tables')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server did not become ready within {timeout}s")
+
+def start_server(app, workers):
+    """Starts `app` (an import string such as 'main:app') under uvicorn. Returns (process, base_url)."""
+    port = _free_port()
+    cmd = [sys.executable, '-m', 'uvicorn', app, '--host', '127.0.0.1', '--port', str(port),
+           '--workers', str(workers), '--log-level', 'warning']
+    proc = subprocess.Popen(cmd)
+    try:
+        _wait_until_ready('127.0.0.1', port, proc)
+    except Exception:
+        stop_server(proc)
+        raise
+    return proc, f"http://127.0.0.1:{port}"
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# ===================================================================
+# LOAD GENERATION
+# ===================================================================
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def _fetch_table_names(base_url):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    try:
+        conn.request('GET', '/api/tables')
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+def _client_loop(base_url, plan, table_names, deadline, seed, results, timeout):
+    parts = urlsplit(base_url)
+    rng = random.Random(seed)
+    kinds, weights = zip(*plan.items())
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    samples = []
+    while time.monotonic() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'tables':
+            path = '/api/tables'
+        elif kind == 'graph':
+            path = '/api/graph-data'
+        elif kind == 'graph_min':
+            path = f"/api/graph-data?min_weight={rng.choice(MIN_WEIGHTS)}&direct_only={rng.choice(['true', 'false'])}"
+        elif kind == 'graph_asof':
+            as_of = time.gmtime(time.time() - rng.uniform(0, AS_OF_WINDOW_S))
+            path = f"/api/graph-data?as_of={time.strftime('%Y-%m-%dT%H:%M:%S', as_of)}"
+        else:
+            path = f"/api/table/{quote(rng.choice(table_names))}"
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+        samples.append((kind, time.perf_counter() - started, ok))
+    conn.close()
+    results.extend(samples)
+
+def run_load(base_url, mix, concurrency, duration, timeout=60.0, seed=0):
+    """Runs one load level and returns a summary dict."""
+    plan = MIXES[mix]
+    table_names = _fetch_table_names(base_url) if 'table' in plan else []
+    if 'table' in plan and not table_names:
+        plan = {k: w for k, w in plan.items() if k != 'table'}
+
+    results = []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=_client_loop,
+                                args=(base_url, plan, table_names, deadline, seed + i, results, timeout))
+               for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return summarize(results, elapsed, mix, concurrency)
+
+def summarize(results, elapsed, mix, concurrency):
+    by_kind = {}
+    for kind, latency, ok in results:
+        by_kind.setdefault(kind, []).append((latency, ok))
+    by_kind['all'] = [(latency, ok) for _, latency, ok in results]
+
+    endpoints = {}
+    for kind, samples in by_kind.items():
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        endpoints[kind] = {
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+            'p50_ms': _ms(percentile(latencies, 50)),
+            'p95_ms': _ms(percentile(latencies, 95)),
+            'p99_ms': _ms(percentile(latencies, 99)),
+            'max_ms': _ms(latencies[-1] if latencies else None),
+        }
+    return {'mix': mix, 'concurrency': concurrency, 'elapsed_s': elapsed, 'endpoints': endpoints}
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000.0
+
+
+# ===================================================================
+# REPORTING
+# ===================================================================
+def print_report(label, summary):
+    print(f"\n=== {label} | mix={summary['mix']} | concurrency={summary['concurrency']} "
+          f"| {summary['elapsed_s']:.1f}s ===")
+    print(f"{'endpoint':<10}{'requests':>10}{'req/s':>10}{'err %':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    fmt = lambda v: f"{v:>10.1f}" if v is not None else f"{'-':>10}"
+    for kind, s in summary['endpoints'].items():
+        print(f"{kind:<10}{s['requests']:>10}{s['throughput_rps']:>10.1f}{s['error_rate'] * 100:>8.2f}"
+              f"{fmt(s['p50_ms'])}{fmt(s['p95_ms'])}{fmt(s['p99_ms'])}{fmt(s['max_ms'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the dashboard API.")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--app", action="append", help="uvicorn app import string(s) to start (default: main:app)")
+    parser.add_argument("--workers", type=int, action="append", help="uvicorn worker count(s) (default: 1)")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="dashboard")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_out", help="Also write all summaries to this JSON file")
+    args = parser.parse_args()
+
+    if args.url:
+        targets = [(args.url, None, None)]
+    else:
+        targets = [(None, app, workers) for app in (args.app or ['main:app']) for workers in (args.workers or [1])]
+
+    summaries = []
+    for url, app, workers in targets:
+        proc = None
+        if url is None:
+            proc, url = start_server(app, workers)
+            label = f"{app} ({workers} worker{'s' if workers != 1 else ''})"
+        else:
+            label = url
+        try:
+            for concurrency in args.concurrency:
+                summary = run_load(url, args.mix, concurrency, args.duration, timeout=args.timeout)
+                summary['target'] = label
+                summaries.append(summary)
+                print_report(label, summary)
+        finally:
+            if proc is not None:
+                stop_server(proc)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(summaries, f, indent=2)
+        print(f"\n✅ Summaries written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
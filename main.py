@@ -1,92 +1,328 @@
 # FILE: main.py
 
+import asyncio
+import hmac
+import os
+from contextlib import asynccontextmanager, contextmanager, suppress
+from datetime import datetime
+from typing import Optional
+
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import sessionmaker
-
-# --- CORRECTED IMPORT BLOCK ---
-from models import (
-    Base, Practice, Stakeholder, Concern, SDG_Target, SDG_Goal,
-    SD_Objective, PracticeAction, Stakeholder_Group, MiningIndicator, SDG_Indicator, # Added SDG_Indicator
-    PracticeToTargetLink, StakeholderToConcernLink, ConcernToTargetLink,
-    PracticeToActionLink, MiningIndicatorToTargetLink, PracticeToMiningIndicatorLink,
-    SDObjectiveToSDGLink
+from pydantic import BaseModel, Field
+
+from coalesce import SingleFlight
+from events import DEFAULT_KEEPALIVE_S, EventHub, describe_change, stream_events
+from history import is_link_model, utc_naive
+from integrity import audit_integrity
+from profiling import ProfilingRoute, install_sql_timing, profile_request
+from prefix_index import DEFAULT_SUGGEST_LIMIT
+from projects import DEFAULT_MAX_OPEN_PROJECTS, DEFAULT_PROJECTS_DIR, KnowledgeBase, ProjectNotFound, ProjectPool
+from queries import (
+    EDGE_TYPES, NODE_MODELS, build_graph_data, build_nodes_batch, build_table_data, level_columns, level_rank,
+    list_table_names, model_for_table,
 )
+from settings import database_url
+from snapshot import DEFAULT_POLL_INTERVAL_S
 
 # --- DATABASE SETUP ---
-DATABASE_URL = "sqlite:///./mining_knowledge.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# DATABASE_URL comes from the environment or .env (see settings.py).
+DATABASE_URL = database_url()
+knowledge_base = KnowledgeBase("", DATABASE_URL)
+engine = knowledge_base.engine
+SessionLocal = knowledge_base.SessionLocal
+install_sql_timing(engine)
+
+# --- PROJECT DATABASES ---
+# /api/{project}/... serves <PROJECTS_DIR>/<project>.db; at most
+# MAX_OPEN_PROJECTS of them are kept open (see projects.py).
+project_pool = ProjectPool(
+    os.getenv("PROJECTS_DIR", DEFAULT_PROJECTS_DIR),
+    int(os.getenv("MAX_OPEN_PROJECTS", DEFAULT_MAX_OPEN_PROJECTS)),
+    on_open=lambda kb: install_sql_timing(kb.engine),
+)
+
+# --- WARM CACHE ---
+# The unfiltered payloads are precomputed at startup and rebuilt in the
+# background whenever the database file changes (see snapshot.py).
+# Project snapshots are refreshed on access instead.
+snapshot_cache = knowledge_base.snapshot_cache
+DATA_POLL_INTERVAL_S = float(os.getenv("DATA_POLL_INTERVAL", DEFAULT_POLL_INTERVAL_S))
+
+# --- CHANGE EVENTS ---
+# Each snapshot rebuild is diffed and pushed to the /api/events subscribers.
+event_hub = EventHub()
+EVENTS_KEEPALIVE_S = float(os.getenv("EVENTS_KEEPALIVE", DEFAULT_KEEPALIVE_S))
+
+async def publish_snapshot_change(old, new):
+    event = await asyncio.to_thread(describe_change, old, new)
+    if event is not None:
+        event_hub.publish(event)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(snapshot_cache.refresh)
+    watcher = asyncio.create_task(snapshot_cache.watch(DATA_POLL_INTERVAL_S, on_change=publish_snapshot_change))
+    try:
+        yield
+    finally:
+        event_hub.close()
+        watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await watcher
+        knowledge_base.close()
+        project_pool.close()
 
 # --- FASTAPI APP ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# Routes defined below can be profiled on demand (see profile_requests).
+app.router.route_class = ProfilingRoute
+
+# Concurrent identical requests for the expensive payloads share one computation.
+single_flight = SingleFlight()
+
+# --- ADMIN ACCESS ---
+# Admin endpoints require the X-Admin-Token header to match the ADMIN_TOKEN
+# environment variable. Without ADMIN_TOKEN they are disabled.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def is_admin(token):
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token, ADMIN_TOKEN))
+
+def require_admin(x_admin_token: str = Header(None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# --- ON-DEMAND PROFILING ---
+# Adding ?__profile=1 to any request (with the admin token) returns a profile
+# report (handler and event-loop cProfile stats, SQL statements with timings)
+# instead of the normal response.
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if request.query_params.get("__profile") != "1":
+        return await call_next(request)
+    if not is_admin(request.headers.get("x-admin-token")):
+        return JSONResponse({"detail": "Admin token required"}, status_code=403)
+    return await profile_request(request, call_next)
+
+# --- SHARED ENDPOINT LOGIC ---
+# Used by the default database routes and the per-project routes alike.
 
-# --- HELPER FUNCTION ---
-def object_as_dict(obj):
-    return {c.key: getattr(obj, c.key) for c in inspect(obj).mapper.column_attrs}
+def _table_names(kb):
+    snapshot = kb.snapshot_cache.current
+    if snapshot is not None:
+        return snapshot.tables
+    return list_table_names(kb.engine)
+
+def _load_table_data(kb, ModelClass, **options):
+    db = kb.SessionLocal()
+    try:
+        return build_table_data(db, ModelClass, **options)
+    finally:
+        db.close()
+
+def _level_options(ModelClass, level, min_level, max_level, sort):
+    """
+    Parses the level query parameters into build_table_data's level_range and
+    sort. `level` may be omitted when the table has a single level column.
+    """
+    columns = level_columns(ModelClass)
+    level_range = None
+    if min_level is not None or max_level is not None:
+        if level is None and len(columns) == 1:
+            level = next(iter(columns))
+        if level not in columns:
+            raise HTTPException(status_code=400, detail=f"level must be one of: {', '.join(columns) or 'none for this table'}")
+        try:
+            level_range = (level,
+                           level_rank(min_level) if min_level is not None else None,
+                           level_rank(max_level) if max_level is not None else None)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    sort_option = None
+    if sort:
+        column = sort.lstrip('-')
+        if column not in columns:
+            raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(columns) or 'none for this table'}")
+        sort_option = (column, sort.startswith('-'))
+    return level_range, sort_option
+
+def _table_data(kb, table_name, as_of=None, level=None, min_level=None, max_level=None, sort=None):
+    ModelClass = model_for_table(table_name)
+    if not ModelClass:
+        raise HTTPException(status_code=404, detail="Table not found")
+    if as_of is not None:
+        # Only link tables have a history (see history.py)
+        if not is_link_model(ModelClass):
+            raise HTTPException(status_code=400, detail="as_of is only supported for link tables")
+        as_of = utc_naive(as_of)
+    level_range, sort_option = _level_options(ModelClass, level, min_level, max_level, sort)
+    if as_of is None and level_range is None and sort_option is None:
+        snapshot = kb.snapshot_cache.current
+        if snapshot is not None and table_name in snapshot.table_payloads:
+            return snapshot.table_payloads[table_name]
+    options = {'as_of': as_of, 'level_range': level_range, 'sort': sort_option}
+    key = ('table', kb.name, table_name, as_of.isoformat() if as_of is not None else None, level_range, sort_option)
+    return single_flight.do(key, lambda: _load_table_data(kb, ModelClass, **options), family='table')
+
+def _load_graph_data(kb, **filters):
+    db = kb.SessionLocal()
+    try:
+        return build_graph_data(db, **filters)
+    finally:
+        db.close()
+
+def _graph_data(kb, min_weight, edge_types, direct_only, as_of=None):
+    # edge_types is a comma-separated list, e.g. ?edge_types=practice_target,stakeholder_concern
+    types = None
+    if edge_types:
+        types = frozenset(t.strip() for t in edge_types.split(',') if t.strip())
+        unknown = sorted(types.difference(EDGE_TYPES))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown edge types: {', '.join(unknown)}")
+    snapshot = kb.snapshot_cache.current
+    if as_of is not None:
+        as_of = utc_naive(as_of)
+    if snapshot is not None and min_weight is None and types is None and not direct_only and as_of is None:
+        return snapshot.graph
+    filters = {'min_weight': min_weight, 'edge_types': types, 'direct_only': direct_only, 'as_of': as_of}
+    key = ('graph-data', kb.name, min_weight, tuple(sorted(types)) if types is not None else None, direct_only,
+           as_of.isoformat() if as_of is not None else None)
+    try:
+        return single_flight.do(key, lambda: _load_graph_data(kb, **filters), family='graph-data')
+    except Exception as e:
+        print(f"An error occurred in get_graph_data: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error while fetching graph data.")
+
+# Upper limit on the ids of one /api/nodes:batch request.
+MAX_BATCH_NODE_IDS = int(os.getenv("MAX_BATCH_NODE_IDS", 1000))
+
+class NodeBatchRequest(BaseModel):
+    ids: list[str] = Field(..., max_length=MAX_BATCH_NODE_IDS)
+
+def _nodes_batch(kb, ids):
+    db = kb.SessionLocal()
+    try:
+        return build_nodes_batch(db, ids)
+    finally:
+        db.close()
+
+def _suggest(kb, group, q, limit):
+    if group not in NODE_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown group: {group}")
+    snapshot = kb.snapshot_cache.current or kb.snapshot_cache.ensure_fresh()
+    return snapshot.prefix_index.suggest(group, q, limit)
+
+@contextmanager
+def _leased_project(project):
+    try:
+        with project_pool.lease(project) as kb:
+            kb.snapshot_cache.ensure_fresh()
+            yield kb
+    except ProjectNotFound:
+        raise HTTPException(status_code=404, detail="Project not found")
 
 # --- API ENDPOINTS ---
 
 @app.get("/api/tables")
 def get_table_names():
-    inspector = inspect(engine)
-    return inspector.get_table_names()
+    return _table_names(knowledge_base)
 
+# ?as_of=<ISO datetime> returns a link table as it was at that time.
+# ?min_level=M/H&max_level=H keeps rows whose level is in that range (levels
+# as 'M/H', 'MEDIUM_HIGH' or 4; &level=<column> where a table has several) and
+# ?sort=<level column> (or -<column> for descending) orders by level.
 @app.get("/api/table/{table_name}")
-def get_table_data(table_name: str):
-    db = SessionLocal()
-    try:
-        ModelClass = next((m.class_ for m in Base.registry.mappers if m.local_table.name == table_name), None)
-        if not ModelClass:
-            raise HTTPException(status_code=404, detail="Table not found")
-        records = db.query(ModelClass).all()
-        return [object_as_dict(rec) for rec in records]
-    finally:
-        db.close()
+def get_table_data(table_name: str, as_of: Optional[datetime] = None, level: Optional[str] = None,
+                   min_level: Optional[str] = None, max_level: Optional[str] = None, sort: Optional[str] = None):
+    return _table_data(knowledge_base, table_name, as_of, level, min_level, max_level, sort)
 
 # --- FULLY CORRECTED ENDPOINT FOR KNOWLEDGE GRAPH ---
 @app.get("/api/graph-data")
-def get_graph_data():
+def get_graph_data(min_weight: Optional[float] = None, edge_types: Optional[str] = None,
+                   direct_only: bool = False, as_of: Optional[datetime] = None):
+    return _graph_data(knowledge_base, min_weight, edge_types, direct_only, as_of)
+
+# Typeahead for the graph selectors: nodes of one group whose label (or any
+# word of it) or id starts with q, ignoring case and accents.
+@app.get("/api/suggest")
+def get_suggestions(group: str, q: str = "", limit: int = Query(DEFAULT_SUGGEST_LIMIT, ge=1, le=100)):
+    return _suggest(knowledge_base, group, q, limit)
+
+# Details of many nodes (of any group) in one round trip, e.g. a node's neighbours.
+@app.post("/api/nodes:batch")
+def get_nodes_batch(request: NodeBatchRequest):
+    return _nodes_batch(knowledge_base, request.ids)
+
+# Server-Sent Events: a 'version' event on connect, then a 'change' event per
+# data change (see events.py). Covers the default database. Open streams keep
+# uvicorn's graceful shutdown waiting, so run it with --timeout-graceful-shutdown.
+@app.get("/api/events")
+async def get_events():
+    snapshot = snapshot_cache.current
+    data_version = snapshot.version if snapshot is not None else None
+    return StreamingResponse(
+        stream_events(event_hub, data_version, EVENTS_KEEPALIVE_S),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- ADMIN ENDPOINTS ---
+
+@app.get("/api/admin/coalescing", dependencies=[Depends(require_admin)])
+def get_coalescing_stats():
+    return single_flight.stats()
+
+@app.get("/api/admin/events", dependencies=[Depends(require_admin)])
+def get_event_stats():
+    return event_hub.stats()
+
+@app.get("/api/admin/projects", dependencies=[Depends(require_admin)])
+def get_project_pool_stats():
+    return project_pool.stats()
+
+@app.get("/api/admin/integrity", dependencies=[Depends(require_admin)])
+def get_integrity_report():
     db = SessionLocal()
     try:
-        nodes = []
-        nodes.extend([{'id': p.id, 'label': p.name, 'group': 'practice'} for p in db.query(Practice).all()])
-        nodes.extend([{'id': s.id, 'label': s.name, 'group': 'stakeholder'} for s in db.query(Stakeholder).all()])
-        nodes.extend([{'id': c.id, 'label': c.name, 'group': 'concern'} for c in db.query(Concern).all()])
-        nodes.extend([{'id': t.id, 'label': t.short_name, 'group': 'target'} for t in db.query(SDG_Target).all()])
-        nodes.extend([{'id': g.id, 'label': g.name, 'group': 'goal'} for g in db.query(SDG_Goal).all()])
-        nodes.extend([{'id': o.id, 'label': o.id, 'group': 'objective'} for o in db.query(SD_Objective).all()])
-        nodes.extend([{'id': a.id, 'label': a.name, 'group': 'action'} for a in db.query(PracticeAction).all()])
-        nodes.extend([{'id': sg.id, 'label': sg.name, 'group': 'stakeholdergroup'} for sg in db.query(Stakeholder_Group).all()])
-        nodes.extend([{'id': mi.id, 'label': mi.name, 'group': 'mining_indicator'} for mi in db.query(MiningIndicator).all()])
-        nodes.extend([{'id': si.id, 'label': f"SDG Indicator {si.id}", 'group': 'sdg_indicator'} for si in db.query(SDG_Indicator).all()])
-
-        edges = []
-        edges.extend([{'from': l.practice_id, 'to': l.target_id} for l in db.query(PracticeToTargetLink).all()])
-        edges.extend([{'from': l.stakeholder_id, 'to': l.concern_id} for l in db.query(StakeholderToConcernLink).all()])
-        edges.extend([{'from': l.concern_id, 'to': l.target_id} for l in db.query(ConcernToTargetLink).all()])
-        edges.extend([{'from': l.practice_id, 'to': l.action_id} for l in db.query(PracticeToActionLink).all()])
-        edges.extend([{'from': l.mining_indicator_id, 'to': l.target_id} for l in db.query(MiningIndicatorToTargetLink).all()])
-        edges.extend([{'from': l.practice_id, 'to': l.mining_indicator_id} for l in db.query(PracticeToMiningIndicatorLink).all()])
-        edges.extend([{'from': l.sd_objective_id, 'to': l.sdg_goal_id} for l in db.query(SDObjectiveToSDGLink).all()])
-
-        for target in db.query(SDG_Target).all():
-            if target.parent_goal_id: edges.append({'from': target.id, 'to': target.parent_goal_id})
-        for indicator in db.query(SDG_Indicator).all():
-            if indicator.parent_target_id: edges.append({'from': indicator.id, 'to': indicator.parent_target_id})
-        for goal in db.query(SDG_Goal).all():
-            if goal.parent_objective_id: edges.append({'from': goal.id, 'to': goal.parent_objective_id})
-        for stakeholder in db.query(Stakeholder).all():
-            if stakeholder.category_id: edges.append({'from': stakeholder.id, 'to': stakeholder.category_id})
-        
-        return {"nodes": nodes, "edges": edges}
-    except Exception as e:
-        print(f"An error occurred in get_graph_data: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error while fetching graph data.")
+        return audit_integrity(db)
     finally:
         db.close()
 
+# --- PROJECT-SCOPED ENDPOINTS ---
+# Registered after the fixed /api routes so those always take precedence.
+
+@app.get("/api/{project}/tables")
+def get_project_table_names(project: str):
+    with _leased_project(project) as kb:
+        return _table_names(kb)
+
+@app.get("/api/{project}/table/{table_name}")
+def get_project_table_data(project: str, table_name: str, as_of: Optional[datetime] = None,
+                           level: Optional[str] = None, min_level: Optional[str] = None,
+                           max_level: Optional[str] = None, sort: Optional[str] = None):
+    with _leased_project(project) as kb:
+        return _table_data(kb, table_name, as_of, level, min_level, max_level, sort)
+
+@app.get("/api/{project}/graph-data")
+def get_project_graph_data(project: str, min_weight: Optional[float] = None,
+                           edge_types: Optional[str] = None, direct_only: bool = False,
+                           as_of: Optional[datetime] = None):
+    with _leased_project(project) as kb:
+        return _graph_data(kb, min_weight, edge_types, direct_only, as_of)
+
+@app.get("/api/{project}/suggest")
+def get_project_suggestions(project: str, group: str, q: str = "",
+                            limit: int = Query(DEFAULT_SUGGEST_LIMIT, ge=1, le=100)):
+    with _leased_project(project) as kb:
+        return _suggest(kb, group, q, limit)
+
+@app.post("/api/{project}/nodes:batch")
+def get_project_nodes_batch(project: str, request: NodeBatchRequest):
+    with _leased_project(project) as kb:
+        return _nodes_batch(kb, request.ids)
+
 # --- SERVE THE FRONTEND ---
-app.mount("/", StaticFiles(directory=".", html=True), name="static")
\ No newline at end of file
+app.mount("/", StaticFiles(directory=".", html=True), name="static")
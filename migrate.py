@@ -0,0 +1,87 @@
+# FILE: migrate.py
+# Brings an existing knowledge database up to the current schema.
+#
+# Safe to run repeatedly: every step only adds what is missing. The server
+# (projects.KnowledgeBase) and the ingest, integrity and export_static CLIs
+# run it on every database they open, so running this script by hand is
+# rarely needed.
+#   1. create_all: creates new tables (e.g. the <link>_history tables) and
+#      their indexes; existing tables are left alone.
+#   2. Adds columns that existing tables are missing. Only generated columns
+#      (the LevelEnum *_rank columns) can be added this way, as SQLite
+#      computes them for the rows already there. Then creates missing indexes.
+#   3. Opens a first history version for every link that has none, so as-of
+#      queries cover the data that existed before the history did.
+#
+# Usage:
+#   python migrate.py [--database-url sqlite:///./mining_knowledge.db]
+
+import argparse
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
+
+import history
+import models
+from settings import database_url
+
+
+def add_missing_columns(engine, metadata=models.Base.metadata):
+    """
+    ALTER TABLE ... ADD COLUMN for every generated column the database lacks,
+    then CREATE INDEX IF NOT EXISTS for every index. Returns {table: [columns added]}.
+    """
+    added = {}
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if column.computed is None:
+                    raise RuntimeError(f"{table.name}.{column.name} is missing and is not a generated column; "
+                                       "it cannot be added automatically.")
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                added.setdefault(table.name, []).append(column.name)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    return added
+
+def migrate(engine):
+    """Runs all migration steps. Returns {step: details} for reporting."""
+    models.Base.metadata.create_all(bind=engine)
+    columns = add_missing_columns(engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        backfilled = {model.__tablename__: history.backfill(db, model) for model in models.LINK_MODELS}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return {'columns': columns, 'history_backfill': backfilled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate a knowledge database to the current schema.")
+    parser.add_argument("--database-url", default=database_url())
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    try:
+        report = migrate(engine)
+    finally:
+        engine.dispose()
+    for table, names in report['columns'].items():
+        print(f"{table}: added {', '.join(names)}.")
+    for table, opened in report['history_backfill'].items():
+        print(f"{table}: {opened} history version(s) opened.")
+    print("\n✅ Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     DateTime,
+    Computed,
+    Index,
     Enum as SQLAlchemyEnum # Renamed to avoid conflict with Python's Enum
 )
 
@@ -28,6 +30,21 @@ class LevelEnum(Enum):
     LOW_MEDIUM = 'L/M'
     LOW = 'L'
 
+    @property
+    def rank(self):
+        # Ordinal position on the 5-level scale, from L = 1 up to H = 5.
+        return {'L': 1, 'L/M': 2, 'M': 3, 'M/H': 4, 'H': 5}[self.value]
+
+
+def level_rank_column(enum_column):
+    """
+    Indexed ordinal companion of a LevelEnum column (L = 1 ... H = 5), so level
+    thresholds and sorts run as SQL range scans. It is a VIRTUAL generated
+    column computed from the stored enum name, so writers never set it.
+    """
+    cases = ' '.join(f"WHEN '{level.name}' THEN {level.rank}" for level in LevelEnum)
+    return Column(Integer, Computed(f"CASE {enum_column} {cases} END"), index=True)
+
 
 # The Declarative Base is a factory for creating base classes for your ORM models.
 # All of our model classes will inherit from this 'Base' object.
@@ -100,6 +117,9 @@ class Practice(Base):
     technical_complexity = Column(SQLAlchemyEnum(LevelEnum))
     operational_disruption = Column(SQLAlchemyEnum(LevelEnum))
     long_term_liability = Column(Boolean)
+    capital_intensity_rank = level_rank_column('capital_intensity')
+    technical_complexity_rank = level_rank_column('technical_complexity')
+    operational_disruption_rank = level_rank_column('operational_disruption')
     
     # Relationships
     target_links = relationship("PracticeToTargetLink", back_populates="practice")
@@ -217,6 +237,7 @@ class PracticeToTargetLink(Base):
     
     # Attributes specific to the link
     relevance_weight = Column(SQLAlchemyEnum(LevelEnum), nullable=False)
+    relevance_weight_rank = level_rank_column('relevance_weight')
     is_direct = Column(Boolean, nullable=False)
     evidence = Column(Text)
     math_model = Column(Text)
@@ -259,6 +280,7 @@ class StakeholderToConcernLink(Base):
     
     # Attributes specific to the link
     priority_weight = Column(SQLAlchemyEnum(LevelEnum), nullable=False)
+    priority_weight_rank = level_rank_column('priority_weight')
     evidence = Column(Text)
     
     # Relationships for back-population
@@ -294,6 +316,7 @@ class SDObjectiveToSDGLink(Base):
     # Attributes specific to the link
     # We use our 5-level enum here for consistency
     weight = Column(SQLAlchemyEnum(LevelEnum), nullable=False)
+    weight_rank = level_rank_column('weight')
     comment = Column(Text)
     
     # Note: we are defining this table to store properties about the link itself. 
@@ -341,4 +364,51 @@ class PracticeToMiningIndicatorLink(Base):
     justification = Column(Text)
     # Relationships
     practice = relationship("Practice", back_populates="mining_project_indicator_links")
-    mining_project_indicator = relationship("MiningIndicator", back_populates="practice_links")
\ No newline at end of file
+    mining_project_indicator = relationship("MiningIndicator", back_populates="practice_links")
+
+
+# ==========================================================
+# ===== LINK HISTORY (append-only, see history.py) =========
+# ==========================================================
+# Every association model above gets a <table>_history table holding one row
+# per version of each link: the link's own columns plus the interval
+# [valid_from, valid_to) during which that version was current. The open
+# (current) version has valid_to = NULL. Rows are only ever appended, and
+# closed by setting valid_to, so the link tables keep their current-state
+# role and the history can answer "what did the graph look like on <date>".
+# History tables have no foreign keys: versions outlive deleted entities.
+
+LINK_MODELS = [
+    PracticeToTargetLink, PracticeToActionLink, StakeholderToConcernLink, ConcernToTargetLink,
+    SDObjectiveToSDGLink, MiningIndicatorToTargetLink, PracticeToMiningIndicatorLink,
+]
+
+def _history_model(link_model):
+    table = link_model.__table__
+    history_table = f"{table.name}_history"
+    key_cols = [c.name for c in table.primary_key.columns]
+    attrs = {
+        '__tablename__': history_table,
+        '__table_args__': (
+            # Versions of one link (closing the open version, per-link history)
+            Index(f"ix_{history_table}_key_time", *key_cols, 'valid_from', 'valid_to'),
+            # As-of queries over the whole table
+            Index(f"ix_{history_table}_time", 'valid_from', 'valid_to'),
+        ),
+        'history_id': Column(Integer, primary_key=True, autoincrement=True),
+        'valid_from': Column(DateTime, nullable=False),
+        'valid_to': Column(DateTime, nullable=True),
+        '__repr__': lambda self: f"<{type(self).__name__} {self.history_id} valid_from='{self.valid_from}'>",
+    }
+    for c in table.columns:
+        if c.computed is not None:
+            attrs[c.key] = Column(c.name, c.type.copy(), Computed(c.computed.sqltext, persisted=c.computed.persisted))
+        else:
+            attrs[c.key] = Column(c.name, c.type.copy(), nullable=c.nullable)
+    return type(f"{link_model.__name__}History", (Base,), attrs)
+
+# link model -> its history model
+LINK_HISTORY = {link_model: _history_model(link_model) for link_model in LINK_MODELS}
+# History tables are only read through the as_of queries; they are kept out of
+# the table list, snapshots, exports and audits.
+HISTORY_TABLES = {history_model.__tablename__ for history_model in LINK_HISTORY.values()}
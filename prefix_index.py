@@ -0,0 +1,85 @@
+# FILE: prefix_index.py
+# Prefix lookup over node labels and ids, used to populate the graph selectors.
+# The same sorted partitions back /api/suggest (PrefixIndex, built per
+# snapshot) and the prefix/ shards of the static bundle (export_static.py).
+# normalizeKey() in script.js must fold keys exactly like normalize_key().
+
+import unicodedata
+from bisect import bisect_left
+
+DEFAULT_SUGGEST_LIMIT = 20
+
+
+def normalize_key(text):
+    """
+    Folds a label or id into its lookup key: accents (nonspacing marks) are
+    stripped and the text is case-folded, so 'Énergie' and 'energie' share a key.
+    """
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+    return ' '.join(stripped.casefold().split())
+
+
+def build_prefix_partitions(nodes):
+    """
+    Builds one sorted partition per node group from graph payload nodes.
+    Each entry is [key, id, label]; a node is indexed under its label, under
+    the rest of its label from every later word (so 'poverty' finds
+    'Eradicate Extreme Poverty') and under its id. Sorting by key lets
+    clients find every match for a prefix with a binary search.
+    """
+    partitions = {}
+    for node in nodes:
+        entries = partitions.setdefault(node['group'], [])
+        label = node['label'] if node['label'] is not None else node['id']
+        words = normalize_key(label).split(' ')
+        keys = {' '.join(words[i:]) for i in range(len(words))}
+        keys.add(normalize_key(node['id']))
+        for key in keys:
+            entries.append([key, node['id'], label])
+    for entries in partitions.values():
+        entries.sort()
+    return partitions
+
+def label_order(entries):
+    """A partition's nodes as [id, label] in label order, each once (for the empty query)."""
+    nodes = {(node_id, label) for _, node_id, label in entries}
+    return [[node_id, label] for node_id, label in sorted(nodes, key=lambda n: (normalize_key(n[1]), n[0]))]
+
+
+class PrefixIndex:
+    """In-memory prefix search over build_prefix_partitions() output."""
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self._keys = {group: [entry[0] for entry in entries] for group, entries in partitions.items()}
+        # Each group's nodes in label order, for the empty query
+        self._by_label = {group: label_order(entries) for group, entries in partitions.items()}
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        return cls(build_prefix_partitions(nodes))
+
+    def groups(self):
+        return list(self.partitions)
+
+    def suggest(self, group, query, limit=DEFAULT_SUGGEST_LIMIT):
+        """
+        Up to `limit` nodes of `group` with a key starting with the normalized
+        query, as {'id', 'label'} in key order. An empty query lists the group
+        in label order. Each node is returned once.
+        """
+        if not normalize_key(query):
+            return [{'id': node_id, 'label': label} for node_id, label in self._by_label.get(group, [])[:limit]]
+        entries = self.partitions.get(group, [])
+        keys = self._keys.get(group, [])
+        prefix = normalize_key(query)
+        results, seen = [], set()
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if len(results) >= limit or not keys[i].startswith(prefix):
+                break
+            _, node_id, label = entries[i]
+            if node_id not in seen:
+                seen.add(node_id)
+                results.append({'id': node_id, 'label': label})
+        return results
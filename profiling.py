@@ -0,0 +1,198 @@
+# FILE: profiling.py
+# On-demand profiling of single API requests.
+#
+# A profiled request (see the middleware in main.py) returns a report instead
+# of its normal response:
+#   - handler_profile: cProfile stats of the endpoint function itself, taken in
+#     the threadpool worker that runs it (ORM hydration, object_as_dict, ...)
+#   - loop_profile:    cProfile stats of the event-loop thread for the whole
+#     request (routing, JSON encoding, StaticFiles, middleware)
+#   - sql:             every statement executed for the request, with timings
+# Only one request is profiled at a time; the loop profile can include work
+# for other requests that were running concurrently. Streaming responses
+# (e.g. the /api/events SSE stream) never end and cannot be profiled.
+#
+# Only one cProfile is active per thread, and from Python 3.12 (where cProfile
+# uses sys.monitoring) only one per interpreter. So on 3.12+ there is no loop
+# profile, and async endpoints, which run on the event-loop thread, get no
+# handler profile before 3.12 (they show up in the loop profile instead).
+
+import asyncio
+import cProfile
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+PROFILE_TOP = 60
+# Upper bound on reading a profiled response, so the profiler is always released.
+PROFILE_TIMEOUT_S = 60.0
+LOOP_PROFILING = sys.version_info < (3, 12)
+
+_current = ContextVar('profile_session', default=None)
+_busy = threading.Lock()
+
+
+class ProfileSession:
+    def __init__(self):
+        self.sql = []
+        self.handler_profile = None
+        self.handler_seconds = None
+        self.error = None
+
+
+def _stats_rows(profile, top=PROFILE_TOP):
+    """Top functions by cumulative time, as JSON-friendly rows."""
+    stats = pstats.Stats(profile)
+    stats.sort_stats('cumulative')
+    rows = []
+    for func in stats.fcn_list[:top]:
+        primitive_calls, calls, tottime, cumtime, _ = stats.stats[func]
+        rows.append({
+            'function': pstats.func_std_string(func),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        })
+    return rows
+
+
+# ===================================================================
+# HANDLER PROFILING
+# ===================================================================
+@contextmanager
+def _handler_profile(session, enabled=True):
+    """Profiles the enclosed block into `session` (timing only if not `enabled`)."""
+    profile = cProfile.Profile() if enabled else None
+    started = time.perf_counter()
+    if profile is not None:
+        try:
+            profile.enable()
+        except ValueError as exc:
+            # Another profiler (or debugger/coverage tool) is already active
+            session.error = f"Could not start the handler profiler: {exc}"
+            profile = None
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+        session.handler_seconds = time.perf_counter() - started
+        session.handler_profile = profile
+
+def profiled(endpoint):
+    """Wraps an endpoint so it runs under cProfile when a profile session is active."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            session = _current.get()
+            if session is None:
+                return await endpoint(*args, **kwargs)
+            with _handler_profile(session, enabled=not LOOP_PROFILING):
+                return await endpoint(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        session = _current.get()
+        if session is None:
+            return endpoint(*args, **kwargs)
+        with _handler_profile(session):
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled on demand; set as the router's route_class."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+# ===================================================================
+# SQL TIMING
+# ===================================================================
+def install_sql_timing(engine):
+    """Records statements and their durations for profiled requests on `engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        session = _current.get()
+        if session is None or not conn.info.get('profile_started'):
+            return
+        seconds = time.perf_counter() - conn.info['profile_started'].pop()
+        session.sql.append({'statement': statement, 'ms': round(seconds * 1000, 3)})
+
+
+# ===================================================================
+# REQUEST PROFILING
+# ===================================================================
+async def _read_body(response):
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+async def profile_request(request, call_next, top=PROFILE_TOP, timeout=PROFILE_TIMEOUT_S):
+    """Runs the request under the profilers and returns the report as the response."""
+    if not _busy.acquire(blocking=False):
+        return JSONResponse({'detail': 'Another request is being profiled'}, status_code=409)
+    session = ProfileSession()
+    token = _current.set(session)
+    loop_profile = cProfile.Profile() if LOOP_PROFILING else None
+    try:
+        started = time.perf_counter()
+        if loop_profile is not None:
+            try:
+                loop_profile.enable()
+            except ValueError as exc:
+                return JSONResponse({'detail': f'Could not start the loop profiler: {exc}'}, status_code=503)
+        try:
+            response = await call_next(request)
+            if response.headers.get('content-type', '').startswith('text/event-stream'):
+                return JSONResponse({'detail': 'Streaming responses cannot be profiled'}, status_code=400)
+            try:
+                body_size = await asyncio.wait_for(_read_body(response), timeout)
+            except asyncio.TimeoutError:
+                return JSONResponse({'detail': f'Response did not complete within {timeout:g}s'}, status_code=504)
+        finally:
+            if loop_profile is not None:
+                loop_profile.disable()
+        total = time.perf_counter() - started
+    finally:
+        _current.reset(token)
+        _busy.release()
+
+    if session.error is not None:
+        return JSONResponse({'detail': session.error}, status_code=503)
+    sql_ms = sum(s['ms'] for s in session.sql)
+    handler_ms = session.handler_seconds * 1000 if session.handler_seconds is not None else None
+    return JSONResponse({
+        'method': request.method,
+        'path': request.url.path,
+        'status_code': response.status_code,
+        'response_bytes': body_size,
+        'timings': {
+            'total_ms': round(total * 1000, 3),
+            'handler_ms': round(handler_ms, 3) if handler_ms is not None else None,
+            'sql_ms': round(sql_ms, 3),
+            'outside_handler_ms': round(total * 1000 - handler_ms, 3) if handler_ms is not None else None,
+        },
+        'sql_count': len(session.sql),
+        'sql': session.sql,
+        'handler_profile': _stats_rows(session.handler_profile, top) if session.handler_profile else None,
+        'loop_profile': _stats_rows(loop_profile, top) if loop_profile is not None else None,
+    })
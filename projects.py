@@ -0,0 +1,127 @@
+# FILE: projects.py
+# Serving several knowledge databases (one per mining project or client) from
+# one process.
+#
+# Each project is a SQLite file <PROJECTS_DIR>/<project>.db. ProjectPool keeps
+# at most `capacity` of them open (engine, probe connection and warm snapshot)
+# and closes the least recently used one when a new project is opened, so
+# memory and file handles stay bounded however many project files exist.
+# Projects that are serving a request are never closed.
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from migrate import migrate
+from snapshot import SnapshotCache
+
+DEFAULT_PROJECTS_DIR = "projects"
+DEFAULT_MAX_OPEN_PROJECTS = 16
+
+PROJECT_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+# First path segments under /api that belong to other routes.
+RESERVED_NAMES = {"admin", "events", "suggest", "table", "tables", "graph-data"}
+
+
+class ProjectNotFound(LookupError):
+    pass
+
+
+class KnowledgeBase:
+    """
+    One knowledge database: its engine, session factory and snapshot cache.
+    The database is migrated to the current schema when it is opened (see migrate.py).
+    """
+
+    def __init__(self, name, database_url, **engine_kwargs):
+        self.name = name
+        self.engine = create_engine(database_url, connect_args={"check_same_thread": False}, **engine_kwargs)
+        migrate(self.engine)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.snapshot_cache = SnapshotCache(self.engine, self.SessionLocal)
+        self.leases = 0
+
+    def close(self):
+        self.snapshot_cache.close()
+        self.engine.dispose()
+
+    def __repr__(self):
+        return f"<KnowledgeBase(name='{self.name}', url='{self.engine.url}')>"
+
+
+class ProjectPool:
+    def __init__(self, directory=DEFAULT_PROJECTS_DIR, capacity=DEFAULT_MAX_OPEN_PROJECTS, on_open=None):
+        self.directory = directory
+        self.capacity = capacity
+        self.on_open = on_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.evicted = 0
+
+    def path_for(self, name):
+        if not PROJECT_NAME_RE.match(name) or name in RESERVED_NAMES:
+            raise ProjectNotFound(name)
+        path = os.path.join(self.directory, f"{name}.db")
+        if not os.path.isfile(path):
+            raise ProjectNotFound(name)
+        return path
+
+    def _open_project(self, name):
+        path = self.path_for(name)
+        # NullPool: a project only holds connections while a request uses them.
+        kb = KnowledgeBase(name, f"sqlite:///{os.path.abspath(path)}", poolclass=NullPool)
+        if self.on_open is not None:
+            self.on_open(kb)
+        self.opened += 1
+        return kb
+
+    def _evict_idle(self):
+        while len(self._open) > self.capacity:
+            idle = next((name for name, kb in self._open.items() if kb.leases == 0), None)
+            if idle is None:
+                return  # everything is in use; shrink once requests finish
+            self._open.pop(idle).close()
+            self.evicted += 1
+
+    @contextmanager
+    def lease(self, name):
+        """
+        Yields the project's KnowledgeBase, opening it if needed and marking it
+        most recently used. Raises ProjectNotFound for unknown projects.
+        """
+        with self._lock:
+            kb = self._open.get(name)
+            if kb is None:
+                kb = self._open_project(name)
+                self._open[name] = kb
+            self._open.move_to_end(name)
+            kb.leases += 1
+            self._evict_idle()
+        try:
+            yield kb
+        finally:
+            with self._lock:
+                kb.leases -= 1
+                self._evict_idle()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'open': list(self._open),
+                'opened': self.opened,
+                'evicted': self.evicted,
+            }
+
+    def close(self):
+        with self._lock:
+            for kb in self._open.values():
+                kb.close()
+            self._open.clear()
@@ -0,0 +1,221 @@
+# FILE: queries.py
+# Read-side queries shared by the API (main.py) and the offline tools
+# (e.g. export_static.py). Everything here takes an open Session and returns
+# plain Python structures, so the same payloads can be served over HTTP or
+# written to disk.
+
+from sqlalchemy import Enum as SQLAlchemyEnum, inspect, literal
+from sqlalchemy.orm import Session
+
+from models import (
+    Base, LevelEnum, Practice, Stakeholder, Concern, SDG_Target, SDG_Goal,
+    SD_Objective, PracticeAction, Stakeholder_Group, MiningIndicator, SDG_Indicator,
+    PracticeToTargetLink, StakeholderToConcernLink, ConcernToTargetLink,
+    PracticeToActionLink, MiningIndicatorToTargetLink, PracticeToMiningIndicatorLink,
+    SDObjectiveToSDGLink, LINK_HISTORY, HISTORY_TABLES
+)
+from history import valid_at
+
+# ===================================================================
+# GRAPH LAYOUT
+# Which models become nodes (and how they are labelled) and which
+# columns become edges. The order here is the order of the payload.
+# ===================================================================
+
+# group name -> (model, function producing the node label)
+NODE_MODELS = {
+    'practice': (Practice, lambda p: p.name),
+    'stakeholder': (Stakeholder, lambda s: s.name),
+    'concern': (Concern, lambda c: c.name),
+    'target': (SDG_Target, lambda t: t.short_name),
+    'goal': (SDG_Goal, lambda g: g.name),
+    'objective': (SD_Objective, lambda o: o.id),
+    'action': (PracticeAction, lambda a: a.name),
+    'stakeholdergroup': (Stakeholder_Group, lambda sg: sg.name),
+    'mining_indicator': (MiningIndicator, lambda mi: mi.name),
+    'sdg_indicator': (SDG_Indicator, lambda si: f"SDG Indicator {si.id}"),
+}
+
+# Every edge carries a 'type' and a numeric 'weight'. Weights come from the
+# link's own attribute: LevelEnum columns give their rank (L = 1 ... H = 5),
+# impact_score is used as is, and links without such an attribute have
+# weight None.
+
+# (edge type, model, from column, to column, weight column, is_direct column)
+LINK_EDGES = [
+    ('practice_target', PracticeToTargetLink, 'practice_id', 'target_id', 'relevance_weight', 'is_direct'),
+    ('stakeholder_concern', StakeholderToConcernLink, 'stakeholder_id', 'concern_id', 'priority_weight', None),
+    ('concern_target', ConcernToTargetLink, 'concern_id', 'target_id', None, None),
+    ('practice_action', PracticeToActionLink, 'practice_id', 'action_id', None, None),
+    ('mining_indicator_target', MiningIndicatorToTargetLink, 'mining_indicator_id', 'target_id', None, None),
+    ('practice_mining_indicator', PracticeToMiningIndicatorLink, 'practice_id', 'mining_indicator_id', 'impact_score', None),
+    ('objective_goal', SDObjectiveToSDGLink, 'sd_objective_id', 'sdg_goal_id', 'weight', None),
+]
+
+# (edge type, model, parent column) for the one-to-many parent references on node tables
+PARENT_EDGES = [
+    ('target_goal', SDG_Target, 'parent_goal_id'),
+    ('sdg_indicator_target', SDG_Indicator, 'parent_target_id'),
+    ('goal_objective', SDG_Goal, 'parent_objective_id'),
+    ('stakeholder_group', Stakeholder, 'category_id'),
+]
+
+EDGE_TYPES = [spec[0] for spec in LINK_EDGES] + [spec[0] for spec in PARENT_EDGES]
+
+# Ids per IN (...) clause, well below SQLite's bound-parameter limit.
+IN_CHUNK_SIZE = 500
+
+
+# --- HELPER FUNCTIONS ---
+def payload_keys(ModelClass):
+    """
+    Attribute keys of a model's payload columns. Generated columns (the *_rank
+    levels) are left out: they only serve filtering and sorting.
+    """
+    return [c.key for c in inspect(ModelClass).column_attrs if c.columns[0].computed is None]
+
+def object_as_dict(obj):
+    return {key: getattr(obj, key) for key in payload_keys(type(obj))}
+
+def model_for_table(table_name):
+    """Returns the mapped class for a table name, or None if it is not mapped (or a history table)."""
+    if table_name in HISTORY_TABLES:
+        return None
+    return next((m.class_ for m in Base.registry.mappers if m.local_table.name == table_name), None)
+
+def list_table_names(engine):
+    """The database's tables as listed by the API, without the link history tables."""
+    return [name for name in inspect(engine).get_table_names() if name not in HISTORY_TABLES]
+
+def level_columns(ModelClass):
+    """{LevelEnum column: its ordinal *_rank column} for a model (see models.level_rank_column)."""
+    table = ModelClass.__table__
+    return {
+        c.name: f"{c.name}_rank" for c in table.columns
+        if isinstance(c.type, SQLAlchemyEnum) and c.type.enum_class is LevelEnum and f"{c.name}_rank" in table.c
+    }
+
+def level_rank(value):
+    """
+    Parses a level given as its value ('M/H'), name ('MEDIUM_HIGH') or rank
+    (4) into its rank. Raises ValueError for anything else.
+    """
+    text = str(value).strip()
+    if text.isdigit() and int(text) in {level.rank for level in LevelEnum}:
+        return int(text)
+    for level in LevelEnum:
+        if text.upper() in (level.value, level.name):
+            return level.rank
+    raise ValueError(f"Unknown level: {value}")
+
+
+# ===================================================================
+# PAYLOAD BUILDERS
+# ===================================================================
+def build_table_data(db: Session, ModelClass, as_of=None, level_range=None, sort=None):
+    """
+    All rows of a table. Optionally, in SQL:
+      as_of        link tables as they were at that time (see history.py)
+      level_range  (level column, min rank, max rank); either bound may be None
+      sort         (level column, descending), ordered by the column's rank
+    Level filters and sorts use the indexed *_rank columns (see level_columns).
+    """
+    if as_of is None and level_range is None and sort is None:
+        records = db.query(ModelClass).all()
+        return [object_as_dict(rec) for rec in records]
+    source = LINK_HISTORY[ModelClass] if as_of is not None else ModelClass
+    keys = payload_keys(ModelClass)
+    query = db.query(*[getattr(source, key) for key in keys])
+    if as_of is not None:
+        query = query.filter(valid_at(source, as_of))
+    if level_range is not None:
+        column, min_rank, max_rank = level_range
+        rank = getattr(source, level_columns(ModelClass)[column])
+        if min_rank is not None:
+            query = query.filter(rank >= min_rank)
+        if max_rank is not None:
+            query = query.filter(rank <= max_rank)
+    if sort is not None:
+        column, descending = sort
+        rank = getattr(source, level_columns(ModelClass)[column])
+        query = query.order_by(rank.desc() if descending else rank.asc())
+    return [dict(zip(keys, row)) for row in query.all()]
+
+def _edge_weight(value):
+    if value is None:
+        return None
+    if isinstance(value, LevelEnum):
+        return value.rank
+    return float(value)
+
+def _weight_filter(model, weight_col, min_weight):
+    """
+    SQL condition keeping rows whose weight is at least min_weight. LevelEnum
+    weights compare their indexed *_rank column.
+    """
+    column = getattr(model, weight_col)
+    if isinstance(column.type, SQLAlchemyEnum):
+        return getattr(model, f"{weight_col}_rank") >= min_weight
+    return column >= min_weight
+
+def build_graph_data(db: Session, min_weight=None, edge_types=None, direct_only=False, as_of=None):
+    """
+    Builds the knowledge graph payload. The optional filters are applied in SQL:
+      min_weight   keep weighted edges with weight >= min_weight (unweighted edges are kept)
+      edge_types   only include edges of these types (see EDGE_TYPES)
+      direct_only  drop practice_target edges that are not direct
+      as_of        take the link edges from their history as of this time
+                   (nodes and parent edges have no history and stay current)
+    Nodes are always complete, so the selectors do not depend on the filters.
+    """
+    nodes = []
+    for group, (model, label) in NODE_MODELS.items():
+        nodes.extend([{'id': n.id, 'label': label(n), 'group': group} for n in db.query(model).all()])
+
+    edges = []
+    for edge_type, model, from_col, to_col, weight_col, direct_col in LINK_EDGES:
+        if edge_types is not None and edge_type not in edge_types:
+            continue
+        source = LINK_HISTORY[model] if as_of is not None else model
+        columns = [getattr(source, from_col), getattr(source, to_col)]
+        columns.append(getattr(source, weight_col) if weight_col else literal(None))
+        columns.append(getattr(source, direct_col) if direct_col else literal(None))
+        query = db.query(*columns)
+        if as_of is not None:
+            query = query.filter(valid_at(source, as_of))
+        if min_weight is not None and weight_col:
+            query = query.filter(_weight_filter(source, weight_col, min_weight))
+        if direct_only and direct_col:
+            query = query.filter(getattr(source, direct_col).is_(True))
+        for from_id, to_id, weight, is_direct in query.all():
+            edge = {'from': from_id, 'to': to_id, 'type': edge_type, 'weight': _edge_weight(weight)}
+            if direct_col:
+                edge['is_direct'] = is_direct
+            edges.append(edge)
+
+    for edge_type, model, parent_col in PARENT_EDGES:
+        if edge_types is not None and edge_type not in edge_types:
+            continue
+        for node_id, parent_id in db.query(model.id, getattr(model, parent_col)).all():
+            if parent_id: edges.append({'from': node_id, 'to': parent_id, 'type': edge_type, 'weight': None})
+
+    return {"nodes": nodes, "edges": edges}
+
+def build_nodes_batch(db: Session, ids):
+    """
+    Looks up nodes of any group by id: one chunked IN (...) query per node
+    model. Returns {'nodes': [...], 'missing': [...]}; each node has its id,
+    group, label and all of its columns as 'attributes'. An id that exists in
+    several groups is returned once per group.
+    """
+    wanted = list(dict.fromkeys(ids))
+    found = {}
+    for group, (model, label) in NODE_MODELS.items():
+        for i in range(0, len(wanted), IN_CHUNK_SIZE):
+            for n in db.query(model).filter(model.id.in_(wanted[i:i + IN_CHUNK_SIZE])).all():
+                found.setdefault(n.id, []).append(
+                    {'id': n.id, 'group': group, 'label': label(n), 'attributes': object_as_dict(n)})
+    return {
+        'nodes': [node for node_id in wanted for node in found.get(node_id, [])],
+        'missing': [node_id for node_id in wanted if node_id not in found],
+    }
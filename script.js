@@ -6,6 +6,203 @@ let graphData = { nodes: [], edges: [] };
 let network = null;
 let tomSelectGroup = null;
 let tomSelectItem = null;
+let displayedNodeIds = new Set();
+
+// --- DATA SOURCE ---
+// The dashboard normally reads from the FastAPI backend (main.py). When the
+// backend is not reachable it falls back to the static bundle written by
+// export_static.py, so the same page works on a plain file/CDN host.
+const STATIC_BUNDLE_DIR = 'static_bundle';
+let staticManifest = null;
+
+function fetchJSON(url) {
+    return fetch(url).then(response => {
+        if (!response.ok) throw new Error(`${url} returned ${response.status}`);
+        return response.json();
+    });
+}
+
+// A static host can answer /api/tables with an HTML page (e.g. an SPA
+// fallback or a 404 page served as 200), so only JSON counts as the backend.
+const dataSourceReady = fetch('/api/tables')
+    .then(response => {
+        if (!response.ok) throw new Error(`/api/tables returned ${response.status}`);
+        if (!(response.headers.get('Content-Type') || '').includes('application/json')) {
+            throw new Error('/api/tables did not return JSON');
+        }
+    })
+    .catch(() => fetchJSON(`${STATIC_BUNDLE_DIR}/manifest.json`).then(manifest => {
+        staticManifest = manifest;
+        console.log(`ℹ️ Backend unavailable, using static bundle ${manifest.data_version}`);
+    }));
+
+function fetchTableNames() {
+    return dataSourceReady.then(() => staticManifest
+        ? Object.keys(staticManifest.tables)
+        : fetchJSON('/api/tables'));
+}
+
+function fetchTableData(tableName) {
+    return dataSourceReady.then(() => staticManifest
+        ? fetchJSON(`${STATIC_BUNDLE_DIR}/${staticManifest.tables[tableName]}`)
+        : fetchJSON(`/api/table/${tableName}`));
+}
+
+function fetchGraphData() {
+    return dataSourceReady.then(() => staticManifest
+        ? fetchJSON(`${STATIC_BUNDLE_DIR}/${staticManifest.graph}`)
+        : fetchJSON('/api/graph-data'));
+}
+
+// Typeahead for the graph selectors (see prefix_index.py). The static bundle
+// ships the same sorted partitions, searched here with a binary search, and
+// each group in label order for the empty query.
+const SUGGEST_LIMIT = 20;
+let latestSuggestionIds = new Set();
+const prefixPartitions = {};
+
+// Same folding as normalize_key(). Upper- then lower-casing stands in for
+// Python's casefold() ('ß' -> 'ss'); the final sigma is folded explicitly.
+function normalizeKey(text) {
+    return String(text).normalize('NFKD').replace(/\p{Mn}/gu, '')
+        .toUpperCase().toLowerCase().replace(/ς/g, 'σ')
+        .split(/\s+/).filter(Boolean).join(' ');
+}
+
+function suggestFromPartition(partition, query, limit) {
+    const prefix = normalizeKey(query);
+    if (!prefix) {
+        return partition.by_label.slice(0, limit).map(([id, label]) => ({ id, label }));
+    }
+    const entries = partition.entries;
+    const results = [];
+    const seen = new Set();
+    const add = (id, label) => {
+        if (!seen.has(id)) { seen.add(id); results.push({ id, label }); }
+    };
+    let lo = 0, hi = entries.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (entries[mid][0] < prefix) lo = mid + 1; else hi = mid;
+    }
+    for (let i = lo; i < entries.length && results.length < limit && entries[i][0].startsWith(prefix); i++) {
+        add(entries[i][1], entries[i][2]);
+    }
+    return results;
+}
+
+function suggestNodes(group, query, limit = SUGGEST_LIMIT) {
+    return dataSourceReady.then(() => {
+        if (!staticManifest) {
+            const params = new URLSearchParams({ group, q: query, limit });
+            return fetchJSON(`/api/suggest?${params}`);
+        }
+        const shard = staticManifest.prefix[group];
+        if (!shard) return [];
+        if (!prefixPartitions[group]) prefixPartitions[group] = fetchJSON(`${STATIC_BUNDLE_DIR}/${shard}`);
+        return prefixPartitions[group].then(partition => suggestFromPartition(partition, query, limit));
+    });
+}
+
+// Same bucketing as node_bucket() in export_static.py: 32-bit FNV-1a over the
+// UTF-8 bytes of the id, modulo the bucket count.
+function nodeBucket(nodeId, buckets) {
+    let h = 0x811c9dc5;
+    for (const byte of new TextEncoder().encode(String(nodeId))) {
+        h = Math.imul(h ^ byte, 0x01000193);
+    }
+    return (h >>> 0) % buckets;
+}
+
+const nodeShards = {};
+
+function fetchNodeShard(bucket) {
+    if (!nodeShards[bucket]) {
+        nodeShards[bucket] = fetchJSON(`${STATIC_BUNDLE_DIR}/${staticManifest.nodes.shards[bucket]}`);
+    }
+    return nodeShards[bucket];
+}
+
+// Node details ({id, group, label, attributes}) for many ids in one request.
+// The static bundle has no node attributes; it answers from the node shards,
+// fetching only the buckets that hold the requested ids.
+function fetchNodes(ids) {
+    return dataSourceReady.then(() => {
+        if (staticManifest) {
+            const buckets = [...new Set(ids.map(id => nodeBucket(id, staticManifest.nodes.buckets)))];
+            return Promise.all(buckets.map(fetchNodeShard)).then(shards => {
+                const hoods = Object.assign({}, ...shards);
+                const nodes = ids
+                    .filter(id => hoods[id])
+                    .map(id => {
+                        const n = hoods[id].node;
+                        return { id: n.id, group: n.group, label: n.label, attributes: {} };
+                    });
+                return { nodes, missing: ids.filter(id => !hoods[id]) };
+            });
+        }
+        return fetch('/api/nodes:batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids })
+        }).then(response => {
+            if (!response.ok) throw new Error(`/api/nodes:batch returned ${response.status}`);
+            return response.json();
+        });
+    });
+}
+
+// --- LIVE UPDATES ---
+// The backend pushes a 'change' event (see events.py) whenever the data
+// changes; only the affected table and graph are refetched. Reconnects are
+// handled by EventSource; the 'version' event sent on (re)connect tells us
+// whether we missed changes in between.
+let dataVersion = null;
+
+function subscribeToChanges() {
+    if (staticManifest || !window.EventSource) return;
+    const events = new EventSource('/api/events');
+    events.addEventListener('version', e => {
+        const { data_version } = JSON.parse(e.data);
+        if (dataVersion !== null && data_version !== dataVersion) {
+            applyChange({ data_version, tables: null, table_list: true, graph: true, nodes: null });
+        }
+        dataVersion = data_version;
+    });
+    events.addEventListener('change', e => applyChange(JSON.parse(e.data)));
+    events.addEventListener('resync', e => {
+        applyChange({ data_version: JSON.parse(e.data).data_version, tables: null, table_list: true, graph: true, nodes: null });
+    });
+}
+
+// tables / nodes === null mean "possibly all of them"
+function applyChange(change) {
+    dataVersion = change.data_version;
+    if (change.table_list) {
+        fetchTableNames()
+            .then(tableNames => {
+                const selector = document.getElementById('table-selector');
+                const selected = selector.value;
+                availableTables = tableNames;
+                populateTableSelection(tableNames);
+                if (tableNames.includes(selected)) selector.value = selected;
+            })
+            .catch(error => console.error("❌ Error reloading table list:", error));
+    }
+    const shownTable = document.getElementById('table-selector').value;
+    if (shownTable && (change.tables === null || change.tables.includes(shownTable))) {
+        handleShowTableClick();
+    }
+    if (change.graph) {
+        fetchGraphData()
+            .then(data => {
+                graphData = data;
+                const affected = change.nodes === null || change.nodes.some(id => displayedNodeIds.has(id));
+                if (network && affected) drawKnowledgeGraph();
+            })
+            .catch(error => console.error("❌ Error reloading graph data:", error));
+    }
+}
 
 // --- TAB SWITCHING LOGIC ---
 function openTab(evt, tabName) {
@@ -23,8 +220,7 @@ function handleShowTableClick() {
     const selector = document.getElementById('table-selector');
     const selectedTableName = selector.value;
     
-    fetch(`/api/table/${selectedTableName}`)
-        .then(response => response.json())
+    fetchTableData(selectedTableName)
         .then(data => {
             const columnNames = (data && data.length > 0) ? Object.keys(data[0]) : [];
             const tableColumns = columnNames.map(colName => ({
@@ -60,51 +256,72 @@ function initializeDataExplorer() {
 // --- KNOWLEDGE GRAPH LOGIC ---
 
 function initializeKnowledgeGraph() {
-    fetch('/api/graph-data')
-        .then(response => response.json())
+    setupGraphSelectors();
+    fetchGraphData()
         .then(data => {
             graphData = data;
-            setupGraphSelectors();
             document.getElementById('show-graph-btn').addEventListener('click', drawKnowledgeGraph);
         })
         .catch(error => console.error("❌ Error loading graph data:", error));
 }
 
-function setupGraphSelectors() {
-    const groupedNodes = graphData.nodes.reduce((acc, node) => {
-        const group = node.group || 'unknown';
-        if (!acc[group]) acc[group] = [];
-        acc[group].push({ value: node.id, text: node.label });
-        return acc;
-    }, {});
+// Node groups in the order of queries.NODE_MODELS. The item selector loads
+// the nodes of the chosen group on demand from suggestNodes().
+const NODE_GROUPS = [
+    'practice', 'stakeholder', 'concern', 'target', 'goal',
+    'objective', 'action', 'stakeholdergroup', 'mining_indicator', 'sdg_indicator'
+];
 
+function setupGraphSelectors() {
     tomSelectGroup = new TomSelect('#graph-group-selector', {
         options: [
             { value: 'all', text: 'Show Full Graph' },
-            ...Object.keys(groupedNodes).map(g => ({ value: `group_${g}`, text: `All ${g.replace(/_/g, ' ')}s` }))
+            ...NODE_GROUPS.map(g => ({ value: `group_${g}`, text: `All ${g.replace(/_/g, ' ')}s` }))
         ],
         onChange: (value) => {
             tomSelectItem.clear();
             tomSelectItem.clearOptions();
             if (value && !value.startsWith('group_') && value !== 'all') {
-                const groupName = value;
-                const items = groupedNodes[groupName] || [];
-                items.sort((a,b) => a.text.localeCompare(b.text));
-                tomSelectItem.addOptions(items);
                 tomSelectItem.enable();
+                // TomSelect preloads only once per instance; re-arm it for the new group
+                tomSelectItem.wrapper.classList.remove('preloaded');
             } else {
                 tomSelectItem.disable();
             }
         }
     });
     
-    Object.keys(groupedNodes).forEach(groupName => {
+    NODE_GROUPS.forEach(groupName => {
         const capitalized = (groupName.charAt(0).toUpperCase() + groupName.slice(1)).replace(/_/g, ' ');
         tomSelectGroup.addOption({ value: groupName, text: capitalized + 's' });
     });
 
     tomSelectItem = new TomSelect('#graph-item-selector', {
         placeholder: 'Select a specific item...',
+        valueField: 'id',
+        labelField: 'label',
+        searchField: [],
+        preload: 'focus',
+        // Results are already matched and ordered by the server; only the
+        // latest result set is shown, never options kept from earlier queries
+        score: () => item => latestSuggestionIds.has(item.id) ? 1 : 0,
+        shouldLoad: () => true,
+        load: (query, callback) => {
+            const group = tomSelectGroup.getValue();
+            suggestNodes(group, query)
+                .then(items => {
+                    // Drop results for a group that is no longer selected
+                    if (group !== tomSelectGroup.getValue()) items = [];
+                    latestSuggestionIds = new Set(items.map(item => item.id));
+                    // Unselected options from earlier queries would otherwise keep their place
+                    tomSelectItem.clearOptions();
+                    callback(items);
+                })
+                .catch(error => {
+                    console.error("❌ Error loading suggestions:", error);
+                    callback();
+                });
+        }
     });
     tomSelectItem.disable();
 }
@@ -155,6 +372,17 @@ function drawKnowledgeGraph() {
         });
     }
 
+    // Thicker edges for stronger links, dashed edges for indirect contributions.
+    displayData.edges = displayData.edges.map(edge => {
+        const weighted = edge.weight !== null && edge.weight !== undefined;
+        return {
+            ...edge,
+            width: weighted ? 0.5 + Math.max(edge.weight, 0) / 2 : 0.5,
+            dashes: edge.is_direct === false,
+            title: edge.type ? `${edge.type.replace(/_/g, ' ')}${weighted ? ` (weight ${edge.weight})` : ''}` : undefined
+        };
+    });
+
     const container = document.getElementById('knowledge-graph-canvas');
     const options = {
         nodes: {
@@ -190,6 +418,7 @@ function drawKnowledgeGraph() {
         }
     };
 
+    displayedNodeIds = new Set(displayData.nodes.map(n => n.id));
     network = new vis.Network(container, displayData, options);
 
     network.on('click', function(params) {
@@ -220,12 +449,13 @@ function drawKnowledgeGraph() {
                         const capitalized = (group.charAt(0).toUpperCase() + group.slice(1)).replace(/_/g, ' ');
                         html += `<details class="connection-group"><summary>${capitalized}s (${connectionsByType[group].length})</summary><ul>`;
                         connectionsByType[group].forEach(cn => {
-                            html += `<li>(<em>${cn.id}</em>) ${cn.label}</li>`;
+                            html += `<li data-node-id="${cn.id}">(<em>${cn.id}</em>) ${cn.label}</li>`;
                         });
                         html += `</ul></details>`;
                     }
                 }
                 infoPanel.innerHTML = html;
+                showNodeDetails(infoPanel, node, connections);
             }
         } else {
             infoPanel.innerHTML = '<h4>Node Information</h4><p>Click on a node to see its details here.</p>';
@@ -233,10 +463,30 @@ function drawKnowledgeGraph() {
     });
 }
 
+// Adds descriptions to the info panel: the clicked node and all of its
+// neighbours are resolved with a single /api/nodes:batch request.
+function showNodeDetails(infoPanel, node, connections) {
+    const ids = [node.id, ...new Set(connections.map(cn => cn.id))];
+    fetchNodes(ids)
+        .then(({ nodes }) => {
+            const details = new Map(nodes.map(n => [n.id, n.attributes]));
+            const description = (details.get(node.id) || {}).description;
+            if (description) {
+                const p = document.createElement('p');
+                p.textContent = description;
+                infoPanel.querySelector('h4').after(p);
+            }
+            infoPanel.querySelectorAll('li[data-node-id]').forEach(li => {
+                const attributes = details.get(li.dataset.nodeId) || {};
+                if (attributes.description) li.title = attributes.description;
+            });
+        })
+        .catch(error => console.error("❌ Error loading node details:", error));
+}
+
 // --- INITIAL PAGE LOAD ---
 document.addEventListener('DOMContentLoaded', () => {
-    fetch('/api/tables')
-        .then(response => response.json())
+    fetchTableNames()
         .then(tableNames => {
             availableTables = tableNames;
             populateTableSelection(tableNames);
@@ -245,4 +495,5 @@ document.addEventListener('DOMContentLoaded', () => {
         .catch(error => console.error("❌ Error loading table list:", error));
 
     initializeKnowledgeGraph();
+    dataSourceReady.then(subscribeToChanges);
 });
\ No newline at end of file
@@ -0,0 +1,17 @@
+# FILE: settings.py
+# Environment settings shared by the server (main.py) and the CLIs.
+#
+# Like the notebooks, values come from the environment or a .env file in the
+# working directory; variables already set in the environment take precedence.
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_DATABASE_URL = "sqlite:///./mining_knowledge.db"
+
+
+def database_url():
+    return os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
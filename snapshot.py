@@ -0,0 +1,175 @@
+# FILE: snapshot.py
+# Precomputed API payloads, rebuilt in the background when the database changes.
+#
+# A Snapshot holds the payloads of /api/tables, every /api/table/{name} and the
+# unfiltered /api/graph-data, plus the prefix index behind /api/suggest.
+# SnapshotCache builds it (at startup, before the first request) and swaps in
+# a new one atomically when DataVersionProbe sees the database change, so
+# requests are served from memory and never pay the cold path. Readers just
+# take `cache.current`; a snapshot is never mutated.
+#
+# Only SQLite files can be probed for changes; for other databases the
+# snapshot is rebuilt on a timer (max_age) instead.
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from export_static import encode
+from prefix_index import PrefixIndex
+from queries import build_graph_data, build_table_data, list_table_names, model_for_table
+
+DEFAULT_POLL_INTERVAL_S = 2.0
+# Databases without a DataVersionProbe (anything but a SQLite file) cannot be
+# watched; their snapshot is rebuilt once it is this old instead.
+DEFAULT_MAX_AGE_S = 60.0
+
+
+class Snapshot:
+    # version is a hash of the payloads (like the static bundle's data_version),
+    # so it is the same across workers and restarts for the same data.
+    def __init__(self, version, signature, tables, table_payloads, graph):
+        self.version = version
+        self.signature = signature
+        self.tables = tables
+        self.table_payloads = table_payloads
+        self.graph = graph
+        # Backs /api/suggest for the node groups of this graph
+        self.prefix_index = PrefixIndex.from_nodes(graph['nodes'])
+        self.built_at = time.time()
+
+
+# ===================================================================
+# CHANGE DETECTION
+# ===================================================================
+class DataVersionProbe:
+    """
+    Cheap "has the database changed?" check for a SQLite file. Combines the
+    file identity/mtime/size (which also catches the file being replaced, e.g.
+    by a reseed) with PRAGMA data_version on a dedicated connection (which
+    catches commits from other connections, including WAL-mode writes that do
+    not touch the main file yet).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._inode = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_engine(cls, engine):
+        """Returns a probe for a file-based SQLite engine, or None for anything else."""
+        if engine.url.get_backend_name() != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            return None
+        return cls(os.path.abspath(engine.url.database))
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def signature(self):
+        with self._lock:
+            db_stat = self._stat(self.path)
+            if db_stat is None:
+                return None
+            if self._conn is None or self._inode != db_stat[0]:
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+                self._inode = db_stat[0]
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return (db_stat, self._stat(f"{self.path}-wal"), data_version)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ===================================================================
+# SNAPSHOT CACHE
+# ===================================================================
+class SnapshotCache:
+    def __init__(self, engine, session_factory, max_age=DEFAULT_MAX_AGE_S):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.probe = DataVersionProbe.for_engine(engine)
+        self.max_age = max_age
+        self.current = None
+        self._refresh_lock = threading.Lock()
+
+    def build(self, signature=None):
+        db = self.session_factory()
+        try:
+            tables = list_table_names(self.engine)
+            payloads = {}
+            for table_name in tables:
+                ModelClass = model_for_table(table_name)
+                if ModelClass is not None:
+                    payloads[table_name] = build_table_data(db, ModelClass)
+            graph = build_graph_data(db)
+        finally:
+            db.close()
+        version = hashlib.sha256(encode([tables, payloads, graph])).hexdigest()[:16]
+        return Snapshot(version, signature, tables, payloads, graph)
+
+    def _swap(self):
+        signature = self.probe.signature() if self.probe else None
+        old, new = self.current, self.build(signature)
+        self.current = new
+        return old, new
+
+    def refresh(self):
+        """Builds a new snapshot and swaps it in. Returns (old, new)."""
+        with self._refresh_lock:
+            return self._swap()
+
+    def is_stale(self):
+        if self.current is None:
+            return True
+        if self.probe is None:
+            return time.time() - self.current.built_at >= self.max_age
+        return self.probe.signature() != self.current.signature
+
+    def ensure_fresh(self):
+        """
+        Returns an up-to-date snapshot, rebuilding it first if the database
+        changed. For caches without a watcher task; concurrent callers share
+        one rebuild.
+        """
+        if self.is_stale():
+            with self._refresh_lock:
+                if self.is_stale():
+                    self._swap()
+        return self.current
+
+    async def watch(self, interval=DEFAULT_POLL_INTERVAL_S, on_change=None):
+        """
+        Polls for changes and rebuilds in a worker thread, forever (cancel the
+        task to stop). After each rebuild, awaits on_change(old, new) if given.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await asyncio.to_thread(self.is_stale):
+                    continue
+                old, new = await asyncio.to_thread(self.refresh)
+                if old is not None and old.version == new.version:
+                    continue  # timed rebuild without changes
+                print(f"Snapshot rebuilt (version {new.version}).")
+                if on_change is not None and old is not None:
+                    await on_change(old, new)
+            except Exception as e:
+                print(f"An error occurred while refreshing the snapshot: {e}")
+
+    def close(self):
+        if self.probe is not None:
+            self.probe.close()